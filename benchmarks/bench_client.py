@@ -0,0 +1,114 @@
+"""
+Measures calls per second, p50/p99 latency and memory of Client and ClientPool
+against the local fake server (benchmarks/fake_server.py), started in a subprocess.
+
+    PYTHONPATH=. python benchmarks/bench_client.py --accounts 1000 --latency 0.005
+"""
+
+import argparse
+import asyncio
+import resource
+import sys
+import tracemalloc
+from pathlib import Path
+from time import perf_counter
+from typing import Awaitable, Callable, List
+import lernsax
+
+
+def percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def report(name: str, latencies: List[float], elapsed: float) -> None:
+    print(
+        f"{name:<34} {len(latencies):>7} calls {len(latencies) / elapsed:>9.0f} calls/s"
+        f"  p50 {percentile(latencies, 0.5) * 1000:7.2f} ms  p99 {percentile(latencies, 0.99) * 1000:7.2f} ms"
+    )
+
+
+async def timed(call: Callable[[], Awaitable], latencies: List[float]) -> None:
+    start = perf_counter()
+    await call()
+    latencies.append(perf_counter() - start)
+
+
+async def run(name: str, calls: List[Callable[[], Awaitable]], concurrency: int) -> None:
+    """ Runs calls with up to concurrency of them at once and reports their latencies """
+    latencies: List[float] = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def limited(call):
+        async with semaphore:
+            await timed(call, latencies)
+
+    start = perf_counter()
+    await asyncio.gather(*(limited(call) for call in calls))
+    report(name, latencies, perf_counter() - start)
+
+
+async def single_account(args: argparse.Namespace, api_uri: str, dav_uri: str) -> None:
+    for batch_size in (0, 50):
+        client = lernsax.Client("bench@example.org", "password", batch_size=batch_size, api_uri=api_uri, dav_uri=dav_uri)
+        await client.login()
+        group = client.member_of[0]
+        label = "batched" if batch_size else "unbatched"
+        if not batch_size:
+            await run("1 account sequential", [lambda: client.get_tasks(group)] * args.calls, 1)
+        await run(f"1 account concurrent {label}", [lambda: client.get_tasks(group)] * args.calls, args.concurrency)
+        await client.close()
+
+    client = lernsax.Client("bench@example.org", "password", api_uri=api_uri, dav_uri=dav_uri)
+    await client.login()
+    start = perf_counter()
+    messages = [msg async for msg in client.iter_quickmessage_history()]
+    print(f"{'1 account history':<34} {len(messages):>7} msgs  {len(messages) / (perf_counter() - start):>9.0f} msgs/s")
+    await client.close()
+
+
+async def many_accounts(args: argparse.Namespace, api_uri: str, dav_uri: str) -> None:
+    tracemalloc.start()
+    start = perf_counter()
+    pool = lernsax.ClientPool(concurrency=args.concurrency, batch_size=args.batch_size, api_uri=api_uri, dav_uri=dav_uri)
+    clients = [pool.client(f"user{i}@example.org", "password") for i in range(args.accounts)]
+    constructed = tracemalloc.get_traced_memory()[0]
+    errors = [res for res in await pool.login_all() if isinstance(res, Exception)]
+    logged_in, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(
+        f"{f'{args.accounts} accounts login':<34} {perf_counter() - start:>7.2f} s  {len(errors)} errors"
+        f"  {constructed / args.accounts / 1024:.1f} KiB/client constructed"
+        f"  {logged_in / args.accounts / 1024:.1f} KiB/client logged in  peak {peak / 2 ** 20:.1f} MiB"
+    )
+    calls = [lambda client=client: client.get_tasks(client.member_of[0]) for client in clients for _ in range(args.rounds)]
+    await run(f"{args.accounts} accounts get_tasks", calls, len(calls))
+    await pool.close()
+
+
+async def main(args: argparse.Namespace) -> None:
+    server = await asyncio.create_subprocess_exec(
+        sys.executable, str(Path(__file__).with_name("fake_server.py")),
+        "--port", "0", "--latency", str(args.latency), stdout=asyncio.subprocess.PIPE,
+    )
+    try:
+        url = (await server.stdout.readline()).decode().strip()
+        api_uri, dav_uri = f"{url}/jsonrpc.php", f"{url}/webdav.php/"
+        print(f"fake server {url}, latency {args.latency * 1000:.1f} ms")
+        await single_account(args, api_uri, dav_uri)
+        await many_accounts(args, api_uri, dav_uri)
+    finally:
+        server.terminate()
+        await server.wait()
+    print(f"max rss {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.1f} MiB")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--calls", type=int, default=2000, help="calls of the single account workloads")
+    parser.add_argument("--accounts", type=int, default=1000)
+    parser.add_argument("--rounds", type=int, default=3, help="calls per account of the many account workload")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--batch-size", type=int, default=0, help="batch_size of the pool clients")
+    parser.add_argument("--latency", type=float, default=0.005, help="seconds the fake server waits per request")
+    asyncio.run(main(parser.parse_args()))
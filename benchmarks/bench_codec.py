@@ -0,0 +1,40 @@
+"""
+Compares decoding large get_messages response bodies with the available codecs
+against aiohttp's default path (decode to str, then json.loads).
+"""
+
+import json
+from importlib.util import find_spec
+from timeit import timeit
+from lernsax.util.codec import CODECS
+
+
+def make_body(amount: int) -> bytes:
+    messages = [
+        {
+            "id": i,
+            "subject": f"Betreff {i} äöü",
+            "date": str(1600000000 + i),
+            "size": 1024 + i,
+            "flags": ["is_unread"] if i % 3 else [],
+            "from": [{"addr": f"sender{i % 50}@example.org", "name": f"Sender {i % 50}"}],
+        }
+        for i in range(amount)
+    ]
+    return json.dumps([
+        {"id": 1, "jsonrpc": "2.0", "result": {"return": "OK"}},
+        {"id": 2, "jsonrpc": "2.0", "result": {"return": "OK"}},
+        {"id": 3, "jsonrpc": "2.0", "result": {"return": "OK", "messages": messages}},
+    ]).encode()
+
+
+if __name__ == "__main__":
+    codecs = {name: cls() for name, cls in CODECS.items() if name == "json" or find_spec(name)}
+    for amount in (1000, 10000, 100000):
+        body = make_body(amount)
+        runs = 20
+        seconds = timeit(lambda: json.loads(body.decode("utf-8")), number=runs) / runs
+        print(f"{amount:>6} messages {'str + json':>10}: {seconds * 1000:9.3f} ms")
+        for name, codec in codecs.items():
+            seconds = timeit(lambda: codec.decode(body), number=runs) / runs
+            print(f"{amount:>6} messages {name:>10}: {seconds * 1000:9.3f} ms")
@@ -0,0 +1,62 @@
+"""
+Groups synthetic quickmessage histories with the old Box based implementation
+and with QuickmessageGrouper, 1% of the messages arrive out of order.
+"""
+
+import random
+from time import perf_counter
+from box import Box
+from lernsax.util.grouping import QuickmessageGrouper
+
+
+def make_messages(amount: int, chats: int = 200, shuffled: float = 0.01) -> list:
+    random.seed(amount)
+    messages = [
+        {
+            "id": str(i),
+            "text": f"message {i}",
+            "date": str(1600000000 + i),
+            "flags": [],
+            "to": {"login": f"chat{i % chats}@example.org", "name_hr": f"Chat {i % chats}", "type": "user"},
+        }
+        for i in range(amount)
+    ]
+    for _ in range(int(amount * shuffled)):
+        a, b = random.randrange(amount), random.randrange(amount)
+        messages[a], messages[b] = messages[b], messages[a]
+    return messages
+
+
+def old_grouping(messages: list) -> dict:
+    grouped_messages = Box({})
+    for msg in messages:
+        msg = Box(msg)
+        msg.date = int(msg.date)
+        if not msg.to.login in grouped_messages:
+            grouped_messages[msg.to.login] = {"chat_name": msg.to.name_hr, "chat_type": msg.to.type, "messages": []}
+        new_message = {"id": msg.id, "text": msg.text, "date": msg.date, "flags": msg.flags}
+        chat = grouped_messages[msg.to.login].messages
+        if len(chat) == 0 or msg.date >= chat[-1].date:
+            chat.append(new_message)
+        else:
+            for index, existing_msg in enumerate(chat):
+                if existing_msg.date >= msg.date:
+                    chat.insert(index, new_message)
+                    break
+    return grouped_messages.to_dict()
+
+
+def new_grouping(messages: list, page_size: int = 1000) -> dict:
+    grouper = QuickmessageGrouper()
+    for i in range(0, len(messages), page_size):
+        grouper.feed(messages[i:i + page_size])
+    return grouper.result()
+
+
+if __name__ == "__main__":
+    for amount, implementations in ((10 ** 4, (old_grouping, new_grouping)), (10 ** 6, (new_grouping,))):
+        messages = make_messages(amount)
+        for func in implementations:
+            start = perf_counter()
+            func(messages)
+            print(f"{amount:>8} messages {func.__name__:>13}: {perf_counter() - start:8.3f} s")
@@ -0,0 +1,58 @@
+"""
+Compares the old Box based result handling with the plain dict path
+on large synthetic get_messages responses.
+"""
+
+from timeit import timeit
+from box import Box
+from lernsax.util import ApiClient, exceptions
+from lernsax.util.view import AttrView
+
+
+def make_response(amount: int) -> list:
+    messages = [
+        {
+            "id": i,
+            "subject": f"Subject {i}",
+            "date": str(1600000000 + i),
+            "size": 1024 + i,
+            "flags": ["is_unread"] if i % 3 else [],
+            "from": [{"addr": f"sender{i % 50}@example.org", "name": f"Sender {i % 50}"}],
+        }
+        for i in range(amount)
+    ]
+    return [
+        {"id": 1, "jsonrpc": "2.0", "result": {"return": "OK"}},
+        {"id": 2, "jsonrpc": "2.0", "result": {"return": "OK"}},
+        {"id": 3, "jsonrpc": "2.0", "result": {"return": "OK", "messages": messages}},
+    ]
+
+
+client = ApiClient()
+
+
+def old_path(results_raw: list) -> dict:
+    results = [Box(res) for res in results_raw]
+    if not results[-1].result["return"] == "OK":
+        raise exceptions.error_handler(results[-1].result.errno)(results_raw[-1]["result"])
+    packed_results = Box({"result": results_raw.pop(2), "helpers": results_raw})
+    return packed_results.to_dict()
+
+
+def new_path(results_raw: list) -> dict:
+    client.check_result(results_raw[-1])
+    return client.pack_responses(results_raw, 2)
+
+
+def lazy_path(results_raw: list) -> str:
+    view = AttrView(new_path(results_raw))
+    return view.result.result.messages[0].subject
+
+
+if __name__ == "__main__":
+    for amount in (1000, 10000, 50000):
+        response = make_response(amount)
+        runs = 3
+        for name, func in (("box", old_path), ("dict", new_path), ("lazy view", lazy_path)):
+            seconds = timeit(lambda: func(list(response)), number=runs) / runs
+            print(f"{amount:>6} messages {name:>10}: {seconds * 1000:9.3f} ms")
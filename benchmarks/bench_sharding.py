@@ -0,0 +1,61 @@
+"""
+Measures how an account sweep scales with the number of ShardedRunner workers.
+Every account logs in and fetches its tasks from local fake servers (benchmarks/fake_server.py)
+sharing one port, so the server side isn't the bottleneck.
+
+    PYTHONPATH=. python benchmarks/bench_sharding.py --accounts 10000 --workers 1 2 4
+"""
+
+import argparse
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+from pathlib import Path
+from time import perf_counter
+from lernsax import ShardedRunner
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def sweep(workers: int, accounts: int, api_uri: str) -> None:
+    async with ShardedRunner(workers, metrics=True, api_uri=api_uri, webdav=False, concurrency=200) as runner:
+        for i in range(accounts):
+            runner.add(f"user{i}@example.org", "password")
+        start = perf_counter()
+        results = await runner.map("get_tasks", ((f"user{i}@example.org", ("group0@example.org",)) for i in range(accounts)))
+        elapsed = perf_counter() - start
+        errors = sum(isinstance(result, Exception) for result in results)
+        requests = sum(histogram.count for histogram in (await runner.metrics()).histograms["request_seconds"].values())
+        print(f"{workers:>3} workers: {accounts} accounts in {elapsed:7.2f} s  {accounts / elapsed:8.0f} accounts/s"
+              f"  {requests} requests  {errors} errors")
+
+
+async def main(args: argparse.Namespace) -> None:
+    port = free_port()
+    servers = [
+        subprocess.Popen([sys.executable, str(Path(__file__).with_name("fake_server.py")), "--port", str(port),
+                          "--latency", str(args.latency), "--reuse-port"], stdout=subprocess.DEVNULL)
+        for _ in range(args.servers)
+    ]
+    try:
+        await asyncio.sleep(1)
+        for workers in args.workers:
+            await sweep(workers, args.accounts, f"http://127.0.0.1:{port}/jsonrpc.php")
+    finally:
+        for server in servers:
+            server.terminate()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--accounts", type=int, default=2000)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--servers", type=int, default=os.cpu_count() or 1, help="fake server processes")
+    parser.add_argument("--latency", type=float, default=0.005)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,47 @@
+"""
+Measures the time of `import lernsax` and of constructing clients,
+with WebDav resolved lazily, resolved right away (the old eager path) and disabled.
+
+    PYTHONPATH=. python benchmarks/bench_startup.py
+"""
+
+import asyncio
+import subprocess
+import sys
+from time import perf_counter
+import lernsax
+
+IMPORT_RUNS = 7
+CLIENTS = 1000
+
+
+def import_time(module: str, setup: str = "pass") -> float:
+    """ Best time of importing module in a fresh interpreter after running setup """
+    code = f"{setup}\nfrom time import perf_counter\nstart = perf_counter()\nimport {module}\nprint(perf_counter() - start)"
+    return min(
+        float(subprocess.run([sys.executable, "-c", code], check=True, capture_output=True, text=True).stdout)
+        for _ in range(IMPORT_RUNS)
+    )
+
+
+async def construct(webdav: bool, resolve: bool) -> float:
+    start = perf_counter()
+    clients = [lernsax.Client(f"user{i}@example.org", "password", webdav=webdav) for i in range(CLIENTS)]
+    if resolve:
+        for client in clients:
+            client.dav
+    elapsed = perf_counter() - start
+    await asyncio.gather(*(client.close() for client in clients))
+    return elapsed
+
+
+async def main() -> None:
+    for name, webdav, resolve in (("webdav lazy", True, False), ("webdav resolved", True, True), ("jsonrpc only", False, False)):
+        elapsed = await construct(webdav, resolve)
+        print(f"construct {CLIENTS} clients {name:>16}: {elapsed:7.3f} s  {elapsed / CLIENTS * 1e6:7.1f} us/client")
+
+
+if __name__ == "__main__":
+    print(f"import lernsax:        {import_time('lernsax') * 1000:7.1f} ms")
+    print(f"aiodav on first use:  +{import_time('aiodav', 'import lernsax') * 1000:7.1f} ms")
+    asyncio.run(main())
@@ -0,0 +1,326 @@
+"""
+Local stand-in for the LernSax jsonrpc.php and webdav.php endpoints.
+
+Sessions, groups and mails are generated in memory, every response is delayed by latency seconds.
+Point clients at it with api_uri=server.api_uri and dav_uri=server.dav_uri, or run it standalone:
+
+    python benchmarks/fake_server.py --port 8765 --latency 0.02
+"""
+
+import argparse
+import asyncio
+import uuid
+from email.utils import formatdate
+from typing import Dict, Optional
+from aiohttp import web
+
+EPOCH = 1600000000
+
+
+def ok(**fields) -> dict:
+    return {"return": "OK", **fields}
+
+
+def fatal(errno: str) -> dict:
+    return {"return": "FATAL", "errno": errno, "error": "simulated error"}
+
+
+class FakeLernSax:
+    """Emulates the jsonrpc api and a WebDav share.
+    groups, entries, mails, history, members (per group) and files control the amount of generated items,
+    text_size the length of texts and file_size the size of WebDav files.
+    Any login and password is accepted, expire_sessions() invalidates all session ids (errno 106).
+    Logins starting with "unknown" can't be focused (errno 107) or sent to (errno 9999).
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.0,
+        groups: int = 3,
+        entries: int = 20,
+        mails: int = 50,
+        history: int = 500,
+        page_size: int = 100,
+        text_size: int = 200,
+        files: int = 4,
+        file_size: int = 1024 * 1024,
+        members: int = 30,
+    ) -> None:
+        self.latency: float = latency
+        self.groups: int = groups
+        self.entries: int = entries
+        self.mails: int = mails
+        self.history: int = history
+        self.page_size: int = page_size
+        self.members: int = members
+        self.text: str = ("lorem ipsum " * (text_size // 12 + 1))[:text_size]
+        self.sessions: Dict[str, str] = {}
+        self.files: Dict[str, bytes] = {
+            f"files/file{i}.bin": bytes(range(256)) * (file_size // 256) for i in range(files)
+        }
+        self.dirs: set = {"files"}
+        self.calls: int = 0
+        self.requests: int = 0
+        self.runner: Optional[web.AppRunner] = None
+        self.url: str = ""
+
+    @property
+    def api_uri(self) -> str:
+        return f"{self.url}/jsonrpc.php"
+
+    @property
+    def dav_uri(self) -> str:
+        return f"{self.url}/webdav.php/"
+
+    def app(self) -> web.Application:
+        app = web.Application(client_max_size=1024 ** 3)
+        app.router.add_post("/jsonrpc.php", self.jsonrpc)
+        app.router.add_get("/download/{path:.*}", self.download)
+        app.router.add_route("*", "/webdav.php/{path:.*}", self.webdav)
+        return app
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0, reuse_port: bool = False) -> "FakeLernSax":
+        self.runner = web.AppRunner(self.app(), access_log=None)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, host, port, reuse_port=reuse_port or None)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.url = f"http://{host}:{port}"
+        return self
+
+    async def close(self) -> None:
+        if self.runner is not None:
+            await self.runner.cleanup()
+
+    async def __aenter__(self) -> "FakeLernSax":
+        return await self.start()
+
+    async def __aexit__(self, *args) -> None:
+        await self.close()
+
+    def expire_sessions(self) -> None:
+        self.sessions.clear()
+
+    def group(self, i: int) -> dict:
+        return {"login": f"group{i}@example.org", "name_hr": f"Group {i}", "type": 6}
+
+    #* jsonrpc
+
+    async def jsonrpc(self, request: web.Request) -> web.Response:
+        data = await request.json()
+        self.requests += 1
+        self.calls += len(data)
+        state = {"login": None, "sid": None, "focus": None}
+        out = []
+        for call in data:
+            handler = getattr(self, "rpc_" + call["method"], None)
+            result = handler(call.get("params") or {}, state) if handler is not None else ok()
+            out.append({"id": call["id"], "jsonrpc": "2.0", "result": result})
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return web.json_response(out)
+
+    def rpc_login(self, params: dict, state: dict) -> dict:
+        state["login"] = params.get("login")
+        state["sid"] = uuid.uuid4().hex
+        self.sessions[state["sid"]] = state["login"]
+        return ok(
+            user={"login": state["login"], "name_hr": state["login"]},
+            member=[self.group(i) for i in range(self.groups)],
+        )
+
+    def rpc_get_information(self, params: dict, state: dict) -> dict:
+        return ok(session_id=state["sid"])
+
+    def rpc_set_session(self, params: dict, state: dict) -> dict:
+        login = self.sessions.get(params.get("session_id"))
+        if login is None:
+            return fatal("106")
+        state["login"], state["sid"] = login, params["session_id"]
+        return ok()
+
+    def rpc_set_focus(self, params: dict, state: dict) -> dict:
+        if state["login"] is None:
+            return fatal("106")
+        if str(params.get("login", "")).startswith("unknown"):
+            return fatal("107")
+        state["focus"] = params.get("object")
+        state["focus_login"] = params.get("login")
+        return ok()
+
+    def rpc_logout(self, params: dict, state: dict) -> dict:
+        self.sessions.pop(state["sid"], None)
+        return ok()
+
+    def rpc_get_entries(self, params: dict, state: dict) -> dict:
+        return ok(entries=[
+            {
+                "id": str(i),
+                "title": f"{state['focus']} {i}",
+                "text": self.text,
+                "description": self.text,
+                "color": "#ff0000",
+                "created": {"date": str(EPOCH + i)},
+                "start_date": str(EPOCH + i),
+                "due_date": str(EPOCH + 86400 + i),
+                "completed": "0",
+            }
+            for i in range(self.entries)
+        ])
+
+    def rpc_get_folders(self, params: dict, state: dict) -> dict:
+        return ok(folders=[{"id": "INBOX", "name": "Posteingang"}, {"id": "Sent", "name": "Gesendet"}])
+
+    def rpc_get_messages(self, params: dict, state: dict) -> dict:
+        return ok(messages=[
+            {
+                "id": i,
+                "subject": f"Subject {i}",
+                "date": str(EPOCH + i),
+                "size": len(self.text),
+                "flags": ["is_unread"] if i % 3 else [],
+                "from": [{"addr": f"sender{i % 10}@example.org", "name": f"Sender {i % 10}"}],
+            }
+            for i in range(1, self.mails + 1)
+        ])
+
+    def rpc_read_message(self, params: dict, state: dict) -> dict:
+        if int(params.get("message_id", 0)) > self.mails:
+            return fatal("9999")
+        return ok(message={"id": params.get("message_id"), "subject": "Subject", "body_plain": self.text})
+
+    def quickmessage(self, i: int) -> dict:
+        return {
+            "id": i,
+            "text": self.text,
+            "date": str(EPOCH + i),
+            "flags": [],
+            "from": {"login": f"user{i % 7}@example.org", "name_hr": f"User {i % 7}"},
+            "to": {"login": f"user{i % 5}@example.org", "name_hr": f"User {i % 5}", "type": 2},
+        }
+
+    def rpc_get_history(self, params: dict, state: dict) -> dict:
+        start = int(params.get("start_id", 0))
+        return ok(messages=[self.quickmessage(i) for i in range(start + 1, min(start + self.page_size, self.history) + 1)])
+
+    def rpc_read_quick_messages(self, params: dict, state: dict) -> dict:
+        return ok(messages=[self.quickmessage(i) for i in range(1, min(self.page_size, self.history) + 1)])
+
+    def rpc_send_quick_message(self, params: dict, state: dict) -> dict:
+        if str(params.get("login", "")).startswith("unknown"):
+            return fatal("9999")
+        return ok()
+
+    def rpc_send_mail(self, params: dict, state: dict) -> dict:
+        if str(params.get("to", "")).startswith("unknown"):
+            return fatal("111")
+        return ok()
+
+    def rpc_get_users(self, params: dict, state: dict) -> dict:
+        #* groupN has members users starting at N * members / 2, neighbouring groups share half of their members
+        login = str(state.get("focus_login") or "")
+        index = login[5:].split("@")[0] if login.startswith("group") else ""
+        start = int(index) * (self.members // 2) if index.isdigit() else 0
+        return ok(users=[
+            {"login": f"user{i}@example.org", "name_hr": f"User {i}", "type": 2} for i in range(start, start + self.members)
+        ])
+
+    def rpc_get_file_download_url(self, params: dict, state: dict) -> dict:
+        path = f"files/{params.get('id')}"
+        if path not in self.files:
+            return fatal("9999")
+        return ok(download_url=f"{self.url}/download/{path}")
+
+    #* files
+
+    def body(self, request: web.Request, content: bytes) -> web.Response:
+        """ Responds with content, honouring single byte ranges """
+        header = request.headers.get("Range", "")
+        if not header.startswith("bytes="):
+            return web.Response(body=content, headers={"Accept-Ranges": "bytes"})
+        start, _, end = header[6:].partition("-")
+        start, end = int(start), int(end) if end else len(content) - 1
+        return web.Response(
+            status=206, body=content[start:end + 1],
+            headers={"Content-Range": f"bytes {start}-{end}/{len(content)}", "Accept-Ranges": "bytes"},
+        )
+
+    async def download(self, request: web.Request) -> web.Response:
+        content = self.files.get(request.match_info["path"])
+        if content is None:
+            raise web.HTTPNotFound()
+        return self.body(request, content)
+
+    def propfind_entry(self, path: str) -> str:
+        is_dir = path not in self.files
+        href = "/webdav.php/" + path + ("/" if is_dir and path else "")
+        size = 0 if is_dir else len(self.files[path])
+        resource = "<d:resourcetype><d:collection/></d:resourcetype>" if is_dir else "<d:resourcetype/>"
+        return (
+            f"<d:response><d:href>{href}</d:href><d:propstat><d:prop>{resource}"
+            f"<d:getcontentlength>{size}</d:getcontentlength><d:getetag>\"{size}\"</d:getetag>"
+            f"<d:getlastmodified>{formatdate(EPOCH, usegmt=True)}</d:getlastmodified>"
+            "</d:prop></d:propstat></d:response>"
+        )
+
+    def children(self, path: str) -> set:
+        prefix = path + "/" if path else ""
+        names = set()
+        for name in (*self.files, *self.dirs):
+            if name.startswith(prefix):
+                rest = name[len(prefix):]
+                names.add(prefix + rest.split("/")[0])
+        return names
+
+    async def webdav(self, request: web.Request) -> web.Response:
+        path = request.match_info["path"].strip("/")
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if request.method == "PROPFIND":
+            if path and path not in self.files and path not in self.dirs:
+                raise web.HTTPNotFound()
+            items = [self.propfind_entry(path)]
+            if path not in self.files and request.headers.get("Depth") != "0":
+                items += [self.propfind_entry(child) for child in sorted(self.children(path))]
+            body = "<?xml version='1.0'?><d:multistatus xmlns:d='DAV:'>" + "".join(items) + "</d:multistatus>"
+            return web.Response(status=207, body=body.encode(), content_type="application/xml")
+        if request.method in ("GET", "HEAD"):
+            if path not in self.files:
+                raise web.HTTPNotFound()
+            return self.body(request, self.files[path])
+        if request.method == "PUT":
+            self.files[path] = await request.read()
+            self.dirs.update(path.rsplit("/", i)[0] for i in range(1, path.count("/") + 1))
+            return web.Response(status=201)
+        if request.method == "MKCOL":
+            self.dirs.add(path)
+            return web.Response(status=201)
+        if request.method == "DELETE":
+            self.files.pop(path, None)
+            return web.Response(status=204)
+        raise web.HTTPMethodNotAllowed(request.method, ["PROPFIND", "GET", "HEAD", "PUT", "MKCOL", "DELETE"])
+
+
+async def serve(args: argparse.Namespace) -> None:
+    server = FakeLernSax(latency=args.latency, entries=args.entries, history=args.history, text_size=args.text_size)
+    await server.start(args.host, args.port, args.reuse_port)
+    print(server.url, flush=True)
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await server.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--reuse-port", action="store_true", help="lets several server processes share the port")
+    parser.add_argument("--entries", type=int, default=20)
+    parser.add_argument("--history", type=int, default=500)
+    parser.add_argument("--text-size", type=int, default=200)
+    try:
+        asyncio.run(serve(parser.parse_args()))
+    except KeyboardInterrupt:
+        pass
@@ -1,4 +1,6 @@
 from .lernsax import Client
+from .pool import ClientPool
+from .runner import ShardedRunner
 
 __version__ = '1.5.3'
 __author__ = 'okok7711'
\ No newline at end of file
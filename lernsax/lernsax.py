@@ -4,39 +4,63 @@
 """
 
 import asyncio
-from typing import List, Union
-from aiohttp import ClientSession, BasicAuth, ClientResponse
+from typing import Any, List, Optional, Union
+from aiohttp import ClientSession, BasicAuth, ClientResponse, ClientTimeout
+from yarl import URL
 from lernsax.util import ApiClient
-import aiodav
-from importlib.util import find_spec
-from logging import getLogger
+from lernsax.util.dispatch import Dispatcher
+from lernsax.util.scheduler import SessionScheduler
+from lernsax.util.codec import Codec, get_codec
+from lernsax.util.dav import TransferEngine
+from lernsax.util.download import download_url_of, stream_response
+from lernsax.util.limits import PriorityRateLimiter, TransferLimiter, priority_of
+from lernsax.util.metrics import Metrics
+from lernsax.util.resilience import RetryPolicy, is_idempotent
+from lernsax.util import exceptions
+from urllib.parse import urljoin
+from logging import getLogger, DEBUG
 
 from time import asctime
 
 logger = getLogger(__name__)
 
-_ORJSON = find_spec("orjson")
-
-if _ORJSON: import orjson as json
-else: import json
+API_URI = "https://www.lernsax.de/jsonrpc.php"
+DAV_URI = "https://www.lernsax.de/webdav.php/"
 
 class HttpClient(ClientSession):
     def __init__(self, *args, **kwargs) -> None:
-        self.api: str = kwargs.pop("api_uri", "https://www.lernsax.de/jsonrpc.php")
+        self.api: str = kwargs.pop("api_uri", API_URI)
+        #* codec name or instance, defaults to the fastest installed one
+        self.codec: Codec = get_codec(kwargs.pop("codec", None))
+        #* timings of DNS, connect and ttfb are traced only if metrics are collected
+        metrics: Optional[Metrics] = kwargs.pop("metrics", None)
+        if metrics is not None:
+            kwargs["trace_configs"] = [*kwargs.get("trace_configs", ()), metrics.trace_config()]
         super().__init__(
             *args,
             **kwargs,
-            json_serialize= lambda obj, *args, **kwargs: json.dumps(obj).decode() if _ORJSON else json.dumps(obj)
+            json_serialize= lambda obj, *args, **kwargs: self.codec.encode(obj).decode()
         )
         
-    async def request(self, *args, **kwargs):
+    async def request(self, method: str, url: str = None, **kwargs):
         """
-        execute and log a request
+        execute and log a request, the url defaults to the jsonrpc api
         """
-        response = await super().request(self.api, *args, **kwargs)
-        self.log_req(response)
+        response = await super().request(method, url or self.api, **kwargs)
+        #* formatting the headers is expensive, skip it unless debug logging is on
+        if logger.isEnabledFor(DEBUG):
+            self.log_req(response)
         return response
 
+    async def post_json(self, obj, url: str = None, **kwargs):
+        """
+        post obj encoded as bytes by the codec and decode the raw response body
+        """
+        response = await self.request(
+            "POST", url, data=self.codec.encode(obj), headers={"Content-Type": "application/json"}, **kwargs)
+        response.raise_for_status()
+        return self.codec.decode(await response.read())
+
     @staticmethod
     def log_req(response: ClientResponse):
         """
@@ -47,34 +71,163 @@ class HttpClient(ClientSession):
             f"Received Headers: {response.headers}"
             )
         
-class Client(ApiClient, aiodav.Client):
-    """ Main object for handling LernSax access and responses. """
+class Client(ApiClient):
+    """Main object for handling LernSax access and responses.
+    Set batch_size to merge concurrent requests issued within batch_delay seconds into one request.
+    With a RetryPolicy requests get timeouts, read only requests are retried with backoff behind a circuit breaker per host of the policy
+    and expired sessions are renewed by logging in again.
+    rate_limit limits requests per second of the client, clients of a ClientPool share the rate limit of the pool,
+    interactive calls are sent before bulk reads.
+    Clients created by a ClientPool share its connection pool, concurrency limit and session scheduler,
+    other clients share the SessionScheduler of the running event loop.
+    api_uri and dav_uri point the client at another server, e.g. benchmarks/fake_server.py.
+    Pass Metrics to record latency per method, batch sizes, errors by errno and connection timings.
+    Methods of aiodav.Client (list, upload, download, ...) are available on the client, the WebDav session and aiodav
+    are only created on first use. With webdav=False the client only talks to the jsonrpc api.
+    With a session_store the session is saved on login and kept open on close, restore_session continues it after a restart.
+    get_miniature=False skips the unused miniature image in login responses.
+    """
 
-    def __init__(self, email: str, password: str) -> None:
+    def __init__(self, email: str, password: str, batch_size: int = 0, batch_delay: float = 0.002, pool: "ClientPool" = None, codec: Union[str, Codec] = None, retry: RetryPolicy = None, rate_limit: float = None, rate_burst: float = None, metrics: Metrics = None, api_uri: str = API_URI, dav_uri: str = DAV_URI, webdav: bool = True, session_store=None, get_miniature: bool = True) -> None:
         self.email: str = email
         self.password: str = password
         self.sid: str = ""
         self.member_of: List[str] = []
-        self.background: asyncio.Task = asyncio.create_task(self.background_task())
-        
-        self.http: HttpClient = HttpClient()
-        self.dav_session: HttpClient = HttpClient(
-            auth = BasicAuth(self.email, self.password))
-        self.dav: aiodav.Client = aiodav.Client(
-            'https://www.lernsax.de/webdav.php/', login=self.email, password=self.password, session=self.dav_session)
+        self.pool: Optional["ClientPool"] = pool
+        #* limits concurrency and bandwidth of download_by_id, shared by all clients of a pool
+        self.download_limiter: Optional[TransferLimiter] = pool.download_limiter if pool is not None else None
+        self.last_activity: float = 0
+        self.retry: Optional[RetryPolicy] = retry
+        self.auto_relogin: bool = retry is not None and retry.relogin
+        self.metrics: Optional[Metrics] = pool.metrics if pool is not None else metrics
+        self.session_store = session_store
+        self.get_miniature: bool = get_miniature
         
-        #* Copying Functions to this client so you don't need to call self.dav.func, higly bogded but it works
-        for func in dir(self.dav):
-            #* dont overwrite functions that already exist
-            if func not in dir(self):
-                #* copy the function or attr
-                setattr(self, func, getattr(self.dav, func)) 
+        self.http: HttpClient = pool.http if pool is not None else HttpClient(codec=codec, metrics=metrics, api_uri=api_uri)
+        if pool is not None and rate_limit and (rate_limit, rate_burst) != (pool.rate_limit, pool.rate_burst):
+            raise ValueError(f"clients of the pool share its rate limit of {pool.rate_limit}, got {rate_limit}")
+        self.rate_limiter: Optional[PriorityRateLimiter] = pool.rate_limiter if pool is not None else (
+            PriorityRateLimiter(rate_limit, rate_burst) if rate_limit else None)
+        self.dispatcher: Optional[Dispatcher] = Dispatcher(
+            self.send_request, batch_size, batch_delay) if batch_size else None
+        self.dav_uri: str = pool.dav_uri if pool is not None else dav_uri
+        self.webdav: bool = webdav
+        #* created on first use by the dav_session and dav properties
+        self._dav_session: Optional[HttpClient] = None
+        self._dav = None
+
+        self.scheduler: SessionScheduler = pool.scheduler if pool is not None else SessionScheduler.default()
+        self.scheduler.register(self)
+
+    @property
+    def dav_session(self) -> HttpClient:
+        """
+        Session authenticated for WebDav, created on first use
+        """
+        if not self.webdav:
+            raise exceptions.WebDavDisabled("client was created with webdav=False")
+        if self._dav_session is None:
+            self._dav_session = HttpClient(
+                auth = BasicAuth(self.email, self.password), connector=self.pool.connector, connector_owner=False
+                ) if self.pool is not None else HttpClient(auth = BasicAuth(self.email, self.password))
+        return self._dav_session
+
+    @property
+    def dav(self):
+        """
+        aiodav.Client using dav_session, aiodav is imported on first use
+        """
+        if self._dav is None:
+            session = self.dav_session
+            import aiodav
+            self._dav = aiodav.Client(self.dav_uri, login=self.email, password=self.password, session=session)
+            #* aiodav checks existence before most operations, which fails on LernSax
+            self._dav.exists = self.exists
+        return self._dav
+
+    def __getattr__(self, name: str) -> Any:
+        #* only called for attributes the client doesn't have, those are looked up on the aiodav client
+        if name.startswith("_") or not self.__dict__.get("webdav"):
+            raise AttributeError(f"{type(self).__name__!r} object has no attribute {name!r}")
+        attr = getattr(self.dav, name)
+        if callable(attr):
+            #* bound methods don't change, later lookups skip __getattr__
+            setattr(self, name, attr)
+        return attr
 
     async def post(self, json: Union[dict, list]) -> dict:
         """
-        Send post request to LernSax
+        Send post request to LernSax, merged with concurrent requests if batching is enabled
+        """
+        if self.dispatcher:
+            return await self.dispatcher.submit(json)
+        return await self.send_request(json)
+
+    async def send_request(self, json: Union[dict, list]) -> dict:
+        """
+        Send a single post request to LernSax
+        """
+        #* every request refreshes the session, the scheduler skips active clients
+        start = self.last_activity = asyncio.get_running_loop().time()
+        if self.metrics is None:
+            return await self.__retry(json)
+        try:
+            results = await self.__retry(json)
+        except Exception as e:
+            self.metrics.record_failure(json, e)
+            raise
+        self.metrics.record_request(json, results, asyncio.get_running_loop().time() - start)
+        return results
+
+    async def __retry(self, json: Union[dict, list]) -> dict:
+        if self.retry is None:
+            return await self.__send(json)
+        return await self.retry.run(
+            lambda: self.__send(json, timeout=ClientTimeout(total=self.retry.timeout)),
+            is_idempotent(json), self.retry.breaker(URL(self.http.api).host))
+
+    async def __send(self, json: Union[dict, list], **kwargs) -> dict:
+        if self.rate_limiter is not None:
+            await self.rate_limiter.acquire(priority_of(json))
+        if self.pool is not None:
+            async with self.pool.limiter.slot(self.email):
+                return await self.http.post_json(json, **kwargs)
+        return await self.http.post_json(json, **kwargs)
+
+    def transfer(self, workers: int = 4, part_size: int = 8 * 1024 * 1024) -> TransferEngine:
+        """
+        Returns a TransferEngine for parallel WebDav downloads and uploads of files and directory trees
+        """
+        return TransferEngine(self.dav_session, self.dav_uri, workers, part_size)
+
+    async def mirror(self, remote: str, local: str, **kwargs) -> dict:
+        """
+        Mirrors the WebDav directory remote into local, downloading only changed files, see TransferEngine.mirror
+        """
+        return await self.transfer().mirror(remote, local, **kwargs)
+
+    async def download_by_id(self, login: str, id: str, dest, chunk_size: int = 64 * 1024, limiter: TransferLimiter = None) -> int:
+        """
+        Resolves the download url of the file id of login and streams the file in chunks to dest, without keeping it in memory.
+        dest may be a path, a file descriptor, an asyncio.StreamWriter, an object with a write method or a callable.
+        limiter defaults to download_limiter. Returns the amount of bytes written
         """
-        return await (await self.http.request("POST", json=json)).json()
+        url = download_url_of(await self.get_download_url(login, id))
+        if not url:
+            raise exceptions.EntryNotFound(id)
+        limiter = limiter or self.download_limiter
+        if limiter is None:
+            return await self.__stream(urljoin(self.http.api, url), dest, chunk_size, None)
+        async with limiter.slot():
+            return await self.__stream(urljoin(self.http.api, url), dest, chunk_size, limiter)
+
+    async def __stream(self, url: str, dest, chunk_size: int, limiter: Optional[TransferLimiter]) -> int:
+        response = await self.http.request("GET", url)
+        try:
+            response.raise_for_status()
+            return await stream_response(response, dest, chunk_size, limiter)
+        finally:
+            response.release()
 
     async def exists(self, *args, **kwargs) -> bool:
         """
@@ -82,21 +235,23 @@ class Client(ApiClient, aiodav.Client):
         """
         return True
 
-    async def background_task(self) -> None:
+    async def close(self) -> None:
         """
-        background task to run cleanup after shutting down and to continuously refresh the sesion
+        Stops refreshing the session, logs out (unless the session is stored) and closes the sessions
         """
-        async def refresher():
-            #! refresh session every 5 minutes
-            while True:
-                if self.sid: print(await self.refresh_session())
-                await asyncio.sleep(60*5)
+        self.scheduler.unregister(self)
+        await self.__cleanup()
+
+    async def __aenter__(self) -> "Client":
+        return self
+
+    async def __aexit__(self, *args) -> None:
+        await self.close()
+
+    async def __cleanup(self):
+        if self.dispatcher: await self.dispatcher.close()
         try:
-            await refresher()
+            if self.sid and self.session_store is None: await self.logout()
         finally:
-            await self.__cleanup()
-    
-    async def __cleanup(self):
-        if self.sid: await self.logout()
-        if not self.http.closed: await self.http.close()
-        if not self.dav_session.closed: await self.dav_session.close()
\ No newline at end of file
+            if self.pool is None and not self.http.closed: await self.http.close()
+            if self._dav_session is not None and not self._dav_session.closed: await self._dav_session.close()
\ No newline at end of file
@@ -0,0 +1,123 @@
+"""
+Pool for many LernSax accounts in one process
+"""
+
+import asyncio
+from typing import Dict, Optional, Union
+from aiohttp import DummyCookieJar, TCPConnector
+from lernsax.lernsax import API_URI, DAV_URI, Client, HttpClient
+from lernsax.util.codec import Codec
+from lernsax.util.limits import FairLimiter, PriorityRateLimiter, TransferLimiter
+from lernsax.util.metrics import Metrics
+from lernsax.util.resilience import RetryPolicy
+from lernsax.util.scheduler import SessionScheduler
+from lernsax.util.sessions import restore_sessions
+
+
+class ClientPool:
+    """Creates clients for many accounts that share one connection pool.
+    Every client keeps its own session id and WebDav credentials,
+    requests of all clients are limited to `concurrency` and scheduled round robin over the accounts.
+    Sessions are kept alive by one SessionScheduler that refreshes up to refresh_batch accounts per request.
+    """
+
+    def __init__(
+        self,
+        limit: int = 100,
+        limit_per_host: int = 0,
+        concurrency: int = 50,
+        keepalive_timeout: float = 30,
+        ttl_dns_cache: int = 300,
+        batch_size: int = 0,
+        batch_delay: float = 0.002,
+        refresh_interval: float = 60 * 5,
+        refresh_batch: int = 50,
+        codec: Union[str, Codec] = None,
+        download_concurrency: int = 8,
+        download_bandwidth: float = None,
+        retry: RetryPolicy = None,
+        rate_limit: float = None,
+        rate_burst: float = None,
+        metrics: Metrics = None,
+        api_uri: str = API_URI,
+        dav_uri: str = DAV_URI,
+        webdav: bool = True,
+        session_store=None,
+        login_stagger: float = 0,
+        get_miniature: bool = True,
+    ) -> None:
+        self.connector: TCPConnector = TCPConnector(
+            limit=limit,
+            limit_per_host=limit_per_host,
+            keepalive_timeout=keepalive_timeout,
+            use_dns_cache=True,
+            ttl_dns_cache=ttl_dns_cache,
+        )
+        #* the jsonrpc api only uses the session id, cookies must not leak between accounts
+        self.http: HttpClient = HttpClient(
+            connector=self.connector, connector_owner=False, cookie_jar=DummyCookieJar(), codec=codec, metrics=metrics, api_uri=api_uri)
+        self.limiter: FairLimiter = FairLimiter(concurrency)
+        #* shared by download_by_id of all clients, bandwidth in bytes per second
+        self.download_limiter: TransferLimiter = TransferLimiter(download_concurrency, download_bandwidth)
+        self.scheduler: SessionScheduler = SessionScheduler(refresh_interval, refresh_batch)
+        self.batch_size: int = batch_size
+        self.batch_delay: float = batch_delay
+        self.retry: Optional[RetryPolicy] = retry
+        self.rate_limit: Optional[float] = rate_limit
+        self.rate_burst: Optional[float] = rate_burst
+        #* shared by all clients of the pool
+        self.rate_limiter: Optional[PriorityRateLimiter] = PriorityRateLimiter(rate_limit, rate_burst) if rate_limit else None
+        #* shared by all clients of the pool
+        self.metrics: Optional[Metrics] = metrics
+        self.dav_uri: str = dav_uri
+        self.webdav: bool = webdav
+        self.session_store = session_store
+        #* seconds the logins of login_all are spread over
+        self.login_stagger: float = login_stagger
+        self.get_miniature: bool = get_miniature
+        self.clients: Dict[str, Client] = {}
+
+    def client(self, email: str, password: str) -> Client:
+        """ Returns the client for the account, creating it if needed """
+        if email not in self.clients:
+            self.clients[email] = Client(
+                email, password, self.batch_size, self.batch_delay, pool=self, retry=self.retry,
+                rate_limit=self.rate_limit, rate_burst=self.rate_burst, webdav=self.webdav,
+                session_store=self.session_store, get_miniature=self.get_miniature)
+        return self.clients[email]
+
+    def __getitem__(self, email: str) -> Client:
+        return self.clients[email]
+
+    def __len__(self) -> int:
+        return len(self.clients)
+
+    async def remove(self, email: str) -> None:
+        """ Closes and removes the client for the account """
+        client = self.clients.pop(email, None)
+        if client:
+            await client.close()
+
+    async def login_all(self) -> list:
+        """Logs in all clients, returns the result or exception for each client.
+        With a session_store, stored sessions are validated in batches and restored (True),
+        only clients without a valid session log in, spread over login_stagger seconds.
+        """
+        if self.session_store is None and not self.login_stagger:
+            return await asyncio.gather(*(client.login() for client in self.clients.values()), return_exceptions=True)
+        return await restore_sessions(list(self.clients.values()), self.scheduler.batch_size, self.login_stagger)
+
+    async def close(self) -> None:
+        """ Closes all clients and the shared connection pool """
+        clients, self.clients = list(self.clients.values()), {}
+        await asyncio.gather(*(client.close() for client in clients), return_exceptions=True)
+        await self.scheduler.close()
+        if not self.http.closed:
+            await self.http.close()
+        await self.connector.close()
+
+    async def __aenter__(self) -> "ClientPool":
+        return self
+
+    async def __aexit__(self, *args) -> None:
+        await self.close()
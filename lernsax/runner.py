@@ -0,0 +1,223 @@
+"""
+Runs clients of many accounts in several processes
+"""
+
+import asyncio
+import hashlib
+import multiprocessing
+import os
+import pickle
+import queue
+from bisect import bisect
+from itertools import count
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from lernsax.pool import ClientPool
+from lernsax.util.metrics import Metrics
+
+
+def _hash(key: str) -> int:
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "big")
+
+
+class HashRing:
+    """Consistent hashing of keys to nodes, every node owns vnodes points of the ring.
+    Adding or removing a node only moves the keys of that node.
+    """
+
+    def __init__(self, nodes: Iterable[int], vnodes: int = 100) -> None:
+        self.ring: List[Tuple[int, int]] = sorted((_hash(f"{node}:{i}"), node) for node in nodes for i in range(vnodes))
+        self.points: List[int] = [point for point, _ in self.ring]
+
+    def node(self, key: str) -> int:
+        return self.ring[bisect(self.points, _hash(key)) % len(self.ring)][1]
+
+
+def _answer(results, id: int, ok: bool, value: Any) -> None:
+    #* pickled here, values the queue can't pickle would be dropped silently
+    try:
+        payload = pickle.dumps(value)
+    except Exception as e:
+        ok, payload = False, pickle.dumps(RuntimeError(repr(value) if not ok else f"result can't be pickled: {e!r}"))
+    results.put((id, ok, payload))
+
+
+async def _call(pool: ClientPool, logins: Dict[str, asyncio.Task], results, id: int, email: str, method: str, args: tuple, kwargs: dict) -> None:
+    try:
+        client = pool[email]
+        if not client.sid and method not in ("login", "restore_session"):
+            #* concurrent calls of an account share its login, a failed login is tried again by the next call
+            login = logins.get(email)
+            if login is None or (login.done() and (login.cancelled() or login.exception() is not None)):
+                login = logins[email] = asyncio.ensure_future(client.restore_session())
+            await asyncio.shield(login)
+        result = await getattr(client, method)(*args, **kwargs)
+    except Exception as e:
+        _answer(results, id, False, e)
+    else:
+        _answer(results, id, True, result)
+
+
+async def _serve(tasks, results, options: dict) -> None:
+    loop = asyncio.get_running_loop()
+    metrics = Metrics() if options.pop("metrics", False) else None
+    pool = ClientPool(metrics=metrics, **options)
+    logins: Dict[str, asyncio.Task] = {}
+    running = set()
+    try:
+        while True:
+            task = await loop.run_in_executor(None, tasks.get)
+            if task is None:
+                break
+            if task[0] == "account":
+                pool.client(task[1], task[2])
+            elif task[0] == "metrics":
+                _answer(results, task[1], True, metrics or Metrics())
+            else:
+                job = loop.create_task(_call(pool, logins, results, *task[1:]))
+                running.add(job)
+                job.add_done_callback(running.discard)
+        await asyncio.gather(*running, return_exceptions=True)
+    finally:
+        await pool.close()
+
+
+def _worker(tasks, results, options: dict) -> None:
+    asyncio.run(_serve(tasks, results, options))
+
+
+class ShardedRunner:
+    """Spreads accounts over `workers` processes with one event loop and ClientPool each.
+    Accounts are assigned to workers by consistent hashing of their email, all calls of an account run in its worker.
+    pool_options are passed to the ClientPool of every worker and must be picklable, metrics=True collects
+    Metrics in every worker which metrics() adds up. Use as:
+    `async with ShardedRunner() as runner: runner.add(email, password); await runner.submit(email, "get_tasks", group)`
+    """
+
+    def __init__(self, workers: int = None, metrics: bool = False, vnodes: int = 100, **pool_options: Any) -> None:
+        self.workers: int = workers or os.cpu_count() or 1
+        self.options: dict = {**pool_options, "metrics": metrics}
+        try:
+            pickle.dumps(self.options)
+        except Exception as e:
+            raise ValueError(f"pool_options are sent to the worker processes and must be picklable: {e!r}") from e
+        self.ring: HashRing = HashRing(range(self.workers), vnodes)
+        self.accounts: Dict[str, int] = {}
+        #* id: (future, index of the worker answering it)
+        self.futures: Dict[int, Tuple[asyncio.Future, int]] = {}
+        self.counter = count()
+        self.processes: List[multiprocessing.Process] = []
+        self.queues: list = []
+        self.results = None
+        self.reader: Optional[asyncio.Task] = None
+
+    async def start(self) -> "ShardedRunner":
+        """ Starts the worker processes """
+        context = multiprocessing.get_context("spawn")
+        self.results = context.Queue()
+        self.queues = [context.Queue() for _ in range(self.workers)]
+        self.processes = [
+            context.Process(target=_worker, args=(tasks, self.results, dict(self.options)), daemon=True)
+            for tasks in self.queues
+        ]
+        for process in self.processes:
+            process.start()
+        self.reader = asyncio.get_running_loop().create_task(self.read())
+        return self
+
+    async def read(self) -> None:
+        loop = asyncio.get_running_loop()
+        checked = loop.time()
+        while True:
+            #* at least once a second, also while other workers keep answering
+            if loop.time() - checked >= 1:
+                self.check_workers()
+                checked = loop.time()
+            try:
+                item = await loop.run_in_executor(None, self.results.get, True, 1)
+            except queue.Empty:
+                continue
+            if item is None:
+                break
+            id, ok, payload = item
+            future, _ = self.futures.pop(id, (None, None))
+            if future is None or future.done():
+                continue
+            value = pickle.loads(payload)
+            if ok:
+                future.set_result(value)
+            else:
+                future.set_exception(value)
+
+    def check_workers(self) -> None:
+        """ Fails the pending calls of workers that exited """
+        dead = {i for i, process in enumerate(self.processes) if not process.is_alive()}
+        if not dead:
+            return
+        for id, (future, worker) in list(self.futures.items()):
+            if worker in dead:
+                del self.futures[id]
+                if not future.done():
+                    future.set_exception(RuntimeError(f"worker {worker} exited with {self.processes[worker].exitcode}"))
+
+    def worker_of(self, email: str) -> int:
+        """ Returns the index of the worker running the account """
+        return self.ring.node(email)
+
+    def add(self, email: str, password: str) -> None:
+        """ Creates the client of the account in its worker, it logs in on its first call """
+        if email not in self.accounts:
+            self.accounts[email] = self.worker_of(email)
+            self.queues[self.accounts[email]].put(("account", email, password))
+
+    def submit(self, email: str, method: str, *args: Any, **kwargs: Any) -> asyncio.Future:
+        """Calls the async ApiClient method of the account in its worker, returns a future of the result.
+        Arguments and results are pickled, exceptions are raised by the future.
+        """
+        if email not in self.accounts:
+            raise KeyError(f"unknown account {email}, add it first")
+        if method.startswith("_"):
+            raise ValueError(f"can't call private method {method}")
+        id, worker = next(self.counter), self.accounts[email]
+        future = asyncio.get_running_loop().create_future()
+        self.futures[id] = (future, worker)
+        self.queues[worker].put(("call", id, email, method, args, kwargs))
+        return future
+
+    async def map(self, method: str, calls: Iterable[Tuple[str, tuple]]) -> list:
+        """ Submits method for every (email, args) and returns the results or exceptions in order """
+        return await asyncio.gather(*(self.submit(email, method, *args) for email, args in calls), return_exceptions=True)
+
+    async def metrics(self) -> Metrics:
+        """ Returns the metrics of all workers added up """
+        loop = asyncio.get_running_loop()
+        futures = []
+        for worker, tasks in enumerate(self.queues):
+            id = next(self.counter)
+            futures.append(loop.create_future())
+            self.futures[id] = (futures[-1], worker)
+            tasks.put(("metrics", id))
+        total = Metrics()
+        for metrics in await asyncio.gather(*futures):
+            total.merge(metrics)
+        return total
+
+    async def close(self) -> None:
+        """ Lets the workers finish their calls, closes their pools and stops them """
+        loop = asyncio.get_running_loop()
+        for tasks in self.queues:
+            tasks.put(None)
+        for process in self.processes:
+            await loop.run_in_executor(None, process.join)
+        if self.reader is not None:
+            self.results.put(None)
+            await self.reader
+        for future, _ in self.futures.values():
+            if not future.done():
+                future.set_exception(RuntimeError("worker stopped before answering"))
+        self.futures = {}
+
+    async def __aenter__(self) -> "ShardedRunner":
+        return await self.start()
+
+    async def __aexit__(self, *args) -> None:
+        await self.close()
@@ -1,2 +1,18 @@
-from .exceptions import *
-from .client import ApiClient
\ No newline at end of file
+from .exceptions import *
+from .client import ApiClient
+from .batch import Batch
+from .dispatch import Dispatcher
+from .limits import FairLimiter, PriorityRateLimiter, TokenBucket, TransferLimiter
+from .scheduler import SessionScheduler
+from .codec import Codec, get_codec
+from .models import Model, Task, Entry, MailHeader, QuickMessage
+from .grouping import QuickmessageGrouper
+from .history import QuickmessageHistory
+from .watch import Watcher, WatchEvent
+from .directory import Directory
+from .mailsync import MailboxSync
+from .cache import ResponseCache, MemoryCache, DiskCache
+from .dav import DavEntry, TransferEngine, TransferStats, propfind
+from .resilience import CircuitBreaker, RetryPolicy
+from .metrics import Metrics
+from .sessions import FileSessionStore, SqliteSessionStore, restore_sessions
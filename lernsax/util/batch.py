@@ -0,0 +1,173 @@
+"""
+Batching of jsonrpc calls for many focus objects
+"""
+
+import asyncio
+from typing import Dict, List, Optional, Tuple
+from . import exceptions
+
+
+class Batch:
+    """Collects jsonrpc calls for many groups and objects and sends them together.
+    All calls share one set_session, set_focus is only sent when the focus changes.
+    Calls are grouped by their focus, calls with the same focus keep their order.
+    Every queued call returns a future resolving to the same dict pack_responses would return,
+    typed_results and attribute_access of the client don't apply to it.
+    Like single calls, requests with an expired session are sent again after logging in if auto_relogin is set.
+    """
+
+    def __init__(self, client, max_calls: int = 0, concurrency: int = 0) -> None:
+        self.client = client
+        #* maximum amount of calls in a single request, 0 means no limit
+        self.max_calls: int = max_calls
+        #* maximum amount of requests in flight, 0 means no limit
+        self.concurrency: int = concurrency
+        self.calls: Dict[Tuple[Optional[str], Optional[str]], List[tuple]] = {}
+
+    async def __aenter__(self) -> "Batch":
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            await self.send()
+        else:
+            for calls in self.calls.values():
+                for *_, future in calls:
+                    future.cancel()
+            self.calls = {}
+
+    def __len__(self) -> int:
+        return sum(len(calls) for calls in self.calls.values())
+
+    def add(self, method: str, params: dict = None, object: str = None, login: str = None, check: bool = False) -> asyncio.Future:
+        """Queues a jsonrpc call for the given focus.
+        If check is set, a non OK return value is set as exception on the future.
+        """
+        future = asyncio.get_running_loop().create_future()
+        self.calls.setdefault((login, object), []).append(
+            (method, params or {}, check, future))
+        return future
+
+    def get_tasks(self, group: str) -> asyncio.Future:
+        """ Queues get_tasks for the group """
+        return self.add("get_entries", object="tasks", login=group)
+
+    def get_members(self, login: str) -> asyncio.Future:
+        """ Queues get_members for the (group-)login, a non OK return is set as exception """
+        return self.add("get_users", object="members", login=login, check=True)
+
+    def get_download_url(self, login: str, id: str) -> asyncio.Future:
+        """ Queues get_download_url for the file id """
+        return self.add("get_file_download_url", {"id": id}, object="files", login=login)
+
+    def get_board(self, login: str) -> asyncio.Future:
+        """ Queues get_board for the login """
+        return self.add("get_entries", object="files", login=login)
+
+    def get_notes(self, login: str) -> asyncio.Future:
+        """ Queues get_notes for the login """
+        return self.add("get_entries", object="notes", login=login)
+
+    def get_emails(self, folder_id: str) -> asyncio.Future:
+        """ Queues get_emails for the folder id """
+        return self.add("get_messages", {"folder_id": folder_id}, object="mailbox")
+
+    def read_email(self, folder_id: str, message_id: int) -> asyncio.Future:
+        """ Queues read_email for the message id """
+        return self.add("read_message", {"folder_id": folder_id, "message_id": message_id}, object="mailbox", check=True)
+
+    def get_email_folders(self) -> asyncio.Future:
+        """ Queues get_email_folders """
+        return self.add("get_folders", object="mailbox")
+
+    def read_quickmessages(self) -> asyncio.Future:
+        """ Queues read_quickmessages """
+        return self.add("read_quick_messages", {"export_session_file": 0}, object="messenger")
+
+    def send_quickmessage(self, login: str, text: str) -> asyncio.Future:
+        """ Queues send_quickmessage to the login """
+        return self.add("send_quick_message", {"login": login, "text": text, "import_session_file": 0}, object="messenger", check=True)
+
+    def send_email(self, to: str, subject: str, body: str) -> asyncio.Future:
+        """ Queues send_email to the address """
+        return self.add("send_mail", {"to": to, "subject": subject, "body_plain": body}, object="mailbox", check=True)
+
+    def add_board_entry(self, login: str, title: str, text: str, color: str) -> asyncio.Future:
+        """ Queues add_board_entry for the (group-)login """
+        return self.add("add_entry", {"title": title, "text": text, "color": color}, object="board", login=login, check=True)
+
+    def envelopes(self) -> List[Tuple[list, list]]:
+        """Builds the requests for all queued calls.
+        Returns a list of (jsonrpc data, calls) where calls holds (id, focus id, call) for every queued call.
+        """
+        envelopes = []
+        data, calls, focus = None, None, None
+        for (login, object), queued in self.calls.items():
+            for call in queued:
+                if data is None or (self.max_calls and len(calls) >= self.max_calls):
+                    data, calls, focus = [
+                        [1, "set_session", {"session_id": self.client.sid}]], [], None
+                    envelopes.append((data, calls))
+                if focus != (login, object):
+                    focus = (login, object)
+                    params = {"object": object}
+                    if login is not None:
+                        params["login"] = login
+                    data.append([len(data) + 1, "set_focus", params])
+                    #* every call of the focus refers to this set_focus
+                    focus_id = len(data)
+                data.append([len(data) + 1, call[0], call[1]])
+                calls.append((len(data), focus_id, call))
+        return envelopes
+
+    async def send(self) -> None:
+        """ Sends all queued calls and resolves their futures """
+        if not self.calls:
+            return
+        if not self.client.sid:
+            raise exceptions.NotLoggedIn()
+        envelopes = self.envelopes()
+        cache = getattr(self.client, "cache", None)
+        if cache is not None:
+            #* writes make cached reads of their focus stale
+            for (login, object), queued in self.calls.items():
+                if not all(cache.cacheable(method) for method, *_ in queued):
+                    cache.invalidate(self.client.email, object, login)
+        self.calls = {}
+        semaphore = asyncio.Semaphore(self.concurrency) if self.concurrency else None
+
+        async def post(data: list) -> list:
+            #* post_session logs in again and replays the request if the session expired and auto_relogin is set
+            if semaphore is None:
+                return await self.client.post_session(self.client.jsonrpc(data))
+            async with semaphore:
+                return await self.client.post_session(self.client.jsonrpc(data))
+
+        responses = await asyncio.gather(*(post(data) for data, _ in envelopes), return_exceptions=True)
+        for (_, calls), results_raw in zip(envelopes, responses):
+            if isinstance(results_raw, BaseException):
+                for *_, (_, _, _, future) in calls:
+                    if not future.done():
+                        future.set_exception(results_raw)
+                continue
+            by_id = {res.get("id"): res for res in results_raw}
+            for id, focus_id, (_, _, check, future) in calls:
+                if future.done():
+                    continue
+                res = by_id.get(id)
+                if res is None:
+                    future.set_exception(
+                        exceptions.ConsequentialError(f"no response for call {id}"))
+                    continue
+                if check:
+                    try:
+                        #* a failed set_session or set_focus is the cause of the failed call
+                        for helper in (by_id.get(1), by_id.get(focus_id)):
+                            if helper is not None:
+                                self.client.check_result(helper)
+                        self.client.check_result(res)
+                    except Exception as e:
+                        future.set_exception(e)
+                        continue
+                future.set_result({"result": res, "helpers": [
+                    by_id.get(1), by_id.get(focus_id)]})
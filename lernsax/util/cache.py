@@ -0,0 +1,161 @@
+"""
+Response cache for read only calls
+"""
+
+import asyncio
+import json
+import sqlite3
+from collections import OrderedDict
+from time import monotonic, time
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+#* (account, object, login, method, params as json)
+CacheKey = Tuple[str, Optional[str], Optional[str], str, str]
+
+#* seconds responses of these methods are cached, other methods invalidate their focus
+DEFAULT_TTLS: Dict[str, float] = {
+    "get_entries": 30,
+    "get_folders": 300,
+    "get_messages": 30,
+}
+
+#* writes to these objects change reads cached under other objects, get_board reads the board with object "files"
+RELATED_OBJECTS: Dict[str, Tuple[str, ...]] = {
+    "board": ("files",),
+}
+
+
+def _matches(key: CacheKey, account: str, object: Optional[str], login: Optional[str]) -> bool:
+    return key[0] == account and key[1] == object and (login is None or key[2] == login)
+
+
+class MemoryCache:
+    """ In memory backend, evicts expired and least recently used entries above max_entries """
+
+    def __init__(self, max_entries: int = 1024) -> None:
+        self.max_entries: int = max_entries
+        self.entries: "OrderedDict[CacheKey, Tuple[float, list]]" = OrderedDict()
+
+    def get(self, key: CacheKey) -> Optional[list]:
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] < monotonic():
+            del self.entries[key]
+            return None
+        self.entries.move_to_end(key)
+        return entry[1]
+
+    def set(self, key: CacheKey, value: list, ttl: float) -> None:
+        self.entries[key] = (monotonic() + ttl, value)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def invalidate(self, account: str, object: Optional[str], login: Optional[str] = None) -> None:
+        for key in [key for key in self.entries if _matches(key, account, object, login)]:
+            del self.entries[key]
+
+    def clear(self) -> None:
+        self.entries.clear()
+
+
+class DiskCache:
+    """ SQLite backend, evicts expired and least recently used entries above max_entries """
+
+    def __init__(self, path: str, max_entries: int = 10000) -> None:
+        self.max_entries: int = max_entries
+        self.db: sqlite3.Connection = sqlite3.connect(path)
+        self.db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS responses (
+                account TEXT, object TEXT, login TEXT, method TEXT, params TEXT,
+                value TEXT, expires REAL, used REAL,
+                PRIMARY KEY (account, object, login, method, params)
+            )
+            """
+        )
+
+    def get(self, key: CacheKey) -> Optional[list]:
+        with self.db:
+            row = self.db.execute(
+                "SELECT value, expires FROM responses WHERE account IS ? AND object IS ? AND login IS ? AND method IS ? AND params IS ?", key).fetchone()
+            if row is None:
+                return None
+            if row[1] < time():
+                self.db.execute(
+                    "DELETE FROM responses WHERE account IS ? AND object IS ? AND login IS ? AND method IS ? AND params IS ?", key)
+                return None
+            self.db.execute(
+                "UPDATE responses SET used = ? WHERE account IS ? AND object IS ? AND login IS ? AND method IS ? AND params IS ?", (time(), *key))
+        return json.loads(row[0])
+
+    def set(self, key: CacheKey, value: list, ttl: float) -> None:
+        now = time()
+        with self.db:
+            self.db.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                            (*key, json.dumps(value), now + ttl, now))
+            self.db.execute("DELETE FROM responses WHERE expires < ?", (now,))
+            self.db.execute(
+                "DELETE FROM responses WHERE rowid NOT IN (SELECT rowid FROM responses ORDER BY used DESC LIMIT ?)", (self.max_entries,))
+
+    def invalidate(self, account: str, object: Optional[str], login: Optional[str] = None) -> None:
+        with self.db:
+            if login is None:
+                self.db.execute("DELETE FROM responses WHERE account IS ? AND object IS ?", (account, object))
+            else:
+                self.db.execute("DELETE FROM responses WHERE account IS ? AND object IS ? AND login IS ?", (account, object, login))
+
+    def clear(self) -> None:
+        with self.db:
+            self.db.execute("DELETE FROM responses")
+
+
+class ResponseCache:
+    """Caches the responses of read only calls per (account, focus object, login, method, params).
+    Identical concurrent calls share one request. Calls of other methods invalidate the cached responses of their focus.
+    Cached responses are shared between callers and must not be modified.
+    """
+
+    def __init__(self, backend=None, ttls: Dict[str, float] = None) -> None:
+        self.backend = backend if backend is not None else MemoryCache()
+        self.ttls: Dict[str, float] = dict(DEFAULT_TTLS if ttls is None else ttls)
+        self.inflight: Dict[CacheKey, asyncio.Future] = {}
+
+    @staticmethod
+    def key(account: str, object: Optional[str], login: Optional[str], method: str, params: dict) -> CacheKey:
+        return (account, object, login, method, json.dumps(params, sort_keys=True))
+
+    def cacheable(self, method: str) -> bool:
+        return method in self.ttls
+
+    async def fetch(self, key: CacheKey, fetch: Callable[[], Awaitable[list]]) -> list:
+        """ Returns the cached response for key, or the response of fetch (shared with identical running calls) """
+        cached = self.backend.get(key)
+        if cached is not None:
+            return cached
+        task = self.inflight.get(key)
+        if task is None:
+            #* the request runs in its own task, a cancelled caller doesn't cancel it for the others
+            task = self.inflight[key] = asyncio.ensure_future(self.store(key, fetch))
+            #* the exception is retrieved by the callers, the task may outlive all of them
+            task.add_done_callback(lambda task: task.cancelled() or task.exception())
+        return await asyncio.shield(task)
+
+    async def store(self, key: CacheKey, fetch: Callable[[], Awaitable[list]]) -> list:
+        """ Runs fetch and caches its response if it returned OK """
+        try:
+            value = await fetch()
+            if value and value[-1].get("result", {}).get("return") == "OK":
+                self.backend.set(key, value, self.ttls[key[3]])
+            return value
+        finally:
+            del self.inflight[key]
+
+    def invalidate(self, account: str, object: Optional[str], login: Optional[str] = None) -> None:
+        """ Drops cached responses of the focus and its RELATED_OBJECTS, all logins of the object if login is None """
+        for target in (object, *RELATED_OBJECTS.get(object, ())):
+            self.backend.invalidate(account, target, login)
+
+    def clear(self) -> None:
+        self.backend.clear()
@@ -2,23 +2,55 @@
 Communicator code to talk with LernSax.de
 """
 
+import asyncio
 from abc import ABC
-from box import Box
+from typing import Callable, Dict, Iterable, Optional, Type, Union
 from . import exceptions
+from .batch import Batch
+from .view import AttrView
+from .models import Model, Task, Entry, MailHeader, QuickMessage
+from .grouping import QuickmessageGrouper
+from .history import QuickmessageHistory
+from .watch import Watcher
+from .directory import Directory
+from .cache import ResponseCache
 
 # Abstract ApiClient only as a skeleton
 
 
 class ApiClient(ABC):
+    #* return AttrView objects allowing attribute access instead of plain dicts
+    attribute_access: bool = False
+    #* return lists of tasks, entries and messages as typed models instead of dicts, Batch futures keep plain dicts
+    typed_results: bool = False
+    #* ResponseCache for read only calls, shared by clients of many accounts if wanted
+    cache: Optional[ResponseCache] = None
+    #* log in again and replay calls once if the session expired (errno 106)
+    auto_relogin: bool = False
+    relogin_lock: Optional[asyncio.Lock] = None
+    #* FileSessionStore or SqliteSessionStore keeping session ids across restarts
+    session_store = None
+    #* login returns a miniature image of the account, unused by the client
+    get_miniature: bool = True
+
     def pack_responses(self, results: list, main_answer_index: int) -> dict:
         """
         Packs multiple method responses together.
         The main response is accessible through the "result" key.
         Helper method responses are accessible through the "helpers" key of the returned dict.
         """
-        packed_results = Box({"result": results.pop(
-            main_answer_index), "helpers": results})
-        return packed_results.to_dict()
+        packed_results = {"result": results.pop(
+            main_answer_index), "helpers": results}
+        return AttrView(packed_results) if self.attribute_access else packed_results
+
+    @staticmethod
+    def check_result(response: dict) -> None:
+        """
+        Raises the matching exception if a method response didn't return OK
+        """
+        result = response["result"]
+        if result["return"] != "OK":
+            raise exceptions.error_handler(result.get("errno"))(result)
 
     def jsonrpc(self, data: list):
         """
@@ -26,6 +58,83 @@ class ApiClient(ABC):
         """
         return [{"id": k[0], "jsonrpc": "2.0", "method": k[1], "params": k[2]} for k in data]
 
+    def batch(self, max_calls: int = 0, concurrency: int = 0) -> Batch:
+        """Returns a Batch to queue calls for many groups and objects, use as:
+        `async with client.batch() as b: tasks = b.get_tasks(group)`
+        max_calls limits the amount of calls sent in a single request, concurrency the amount of requests in flight.
+        """
+        return Batch(self, max_calls, concurrency)
+
+    async def bulk(self, targets: Iterable[str], queue: Callable[[Batch, str], asyncio.Future], chunk_size: int = 50, concurrency: int = 4) -> Dict[str, Union[dict, Exception]]:
+        """Queues a call for every target with queue(batch, target) and sends them in requests of up to chunk_size calls,
+        with at most concurrency requests in flight.
+        Returns a report mapping every target to its result or the exception of exceptions.error_handler,
+        a failing target doesn't stop the others. Duplicate targets are only sent once.
+        """
+        batch = self.batch(chunk_size, concurrency)
+        futures = {target: queue(batch, target) for target in dict.fromkeys(targets)}
+        await batch.send()
+        return {target: future.exception() or future.result() for target, future in futures.items()}
+
+    async def call(self, method: str, params: dict = None, object: str = None, login: str = None, check: bool = False, model: Type[Model] = None) -> dict:
+        """Calls a method within the current session, focused on object (of login).
+        If check is set, a non OK return raises the matching exception.
+        If typed_results is set, the list of the result is converted to instances of model.
+        """
+        if not self.sid:
+            raise exceptions.NotLoggedIn()
+        focus = {"object": object}
+        if login is not None:
+            focus["login"] = login
+        data = self.jsonrpc(
+            [
+                [1, "set_session", {"session_id": self.sid}],
+                [2, "set_focus", focus],
+                [3, method, params or {}],
+            ]
+        )
+        if self.cache is None:
+            results_raw = await self.post_session(data)
+        elif self.cache.cacheable(method):
+            #* cached responses are shared, they are copied before being modified below
+            results_raw = list(await self.cache.fetch(
+                self.cache.key(self.email, object, login, method, params or {}), lambda: self.post_session(data)))
+        else:
+            results_raw = await self.post_session(data)
+            self.cache.invalidate(self.email, object, login)
+        if check:
+            self.check_result(results_raw[-1])
+        if model is not None and self.typed_results:
+            result = results_raw[-1]["result"]
+            if isinstance(result.get(model.key), list):
+                results_raw[-1] = {**results_raw[-1], "result": {
+                    **result, model.key: [model.from_dict(entry) for entry in result[model.key]]}}
+        return self.pack_responses(results_raw, 2)
+
+    @staticmethod
+    def session_expired(results_raw: list) -> bool:
+        """ Returns whether any response failed because the session is invalid """
+        return any(res.get("result", {}).get("errno") == "106" for res in results_raw)
+
+    async def post_session(self, data: list) -> list:
+        """Posts a request starting with set_session.
+        If auto_relogin is set and the session expired, logs in again and replays the request once.
+        """
+        results_raw = await self.post(data)
+        if self.auto_relogin and self.session_expired(results_raw):
+            await self.relogin(data[0]["params"]["session_id"])
+            data = [{**data[0], "params": {"session_id": self.sid}}, *data[1:]]
+            results_raw = await self.post(data)
+        return results_raw
+
+    async def relogin(self, expired_sid: str) -> None:
+        """ Logs in again unless another call already replaced expired_sid """
+        if self.relogin_lock is None:
+            self.relogin_lock = asyncio.Lock()
+        async with self.relogin_lock:
+            if self.sid == expired_sid or not self.sid:
+                await self.login()
+
     async def login(self, email: str = "", password: str = "") -> dict:
         """ Enter the LernSax session """
         if not email or not password:
@@ -37,26 +146,37 @@ class ApiClient(ABC):
                         1,
                         "login",
                         {"login": email, "password": password,
-                            "get_miniature": True},
+                            "get_miniature": self.get_miniature},
                     ],
                     [999, "get_information", {}],
                 ]
             )
         )
-        results = [Box(res) for res in results_raw]
-
-        if not results[0].result["return"] == "OK":
-            raise exceptions.error_handler(
-                results[0].result.errno)(results_raw[0]["result"])
+        self.check_result(results_raw[0])
 
         self.sid, self.email, self.password, self.member_of = (
-            results[1].result.session_id,
+            results_raw[1]["result"]["session_id"],
             email,
             password,
-            [member.login for member in results[0].result.member],
+            [member["login"] for member in results_raw[0]["result"]["member"]],
         )
+        if self.session_store is not None:
+            self.session_store.set(self.email, self.sid, self.member_of)
         return self.pack_responses(results_raw, 0)
 
+    async def restore_session(self) -> bool:
+        """Continues the session kept in session_store if it is still valid, logs in otherwise.
+        Returns whether the stored session was restored
+        """
+        stored = self.session_store.get(self.email) if self.session_store is not None else None
+        if stored is not None:
+            results_raw = await self.post(self.jsonrpc([[1, "set_session", {"session_id": stored[0]}]]))
+            if results_raw[0]["result"]["return"] == "OK":
+                self.sid, self.member_of = stored[0], list(stored[1])
+                return True
+        await self.login()
+        return False
+
     async def refresh_session(self) -> dict:
         """ Refreshes current LernSax session. """
         if not self.sid:
@@ -66,280 +186,121 @@ class ApiClient(ABC):
 
     async def logout(self) -> dict:
         """ Exit the LernSax session """
-        results_raw = await self.post(
-            self.jsonrpc(
-                [
-                    [1, "set_session", {"session_id": self.sid}],
-                    [2, "set_focus", {"object": "settings"}],
-                    [3, "logout", {}],
-                ]
-            )
-        )
-        results = [Box(res) for res in results_raw]
-        if not results[-1].result["return"] == "OK":
-            raise exceptions.error_handler(
-                results[-1].result.errno)(results_raw[-1]["result"])
+        results = await self.call("logout", object="settings", check=True)
         self.sid = ""
-        return self.pack_responses(results_raw, 2)
+        if self.session_store is not None:
+            self.session_store.delete(self.email)
+        return results
 
     async def get_tasks(self, group: str) -> dict:
         """ Get LernSax tasks, thanks to  TKFRvisionOfficial for finding the json rpc request """
-        if not self.sid:
-            raise exceptions.NotLoggedIn()
-        results_raw = await self.post(
-            self.jsonrpc(
-                [
-                    [1, "set_session", {"session_id": self.sid}],
-                    [2, "set_focus", {"login": group, "object": "tasks"}],
-                    [3, "get_entries", {}],
-                ]
-            )
-        )
-        return self.pack_responses(results_raw, 2)
+        return await self.call("get_entries", object="tasks", login=group, model=Task)
+
+    # MembersRequest
+
+    async def get_members(self, login: str) -> dict:
+        """ Gets the members of the (group-)login """
+        return await self.call("get_users", object="members", login=login)
+
+    def directory(self, path: str = None, batch_size: int = 50) -> Directory:
+        """Returns a Directory indexing the members of all groups, fill it with `await directory.refresh()`.
+        With a path the index is stored in an SQLite database and loaded from it next time.
+        """
+        return Directory(self, path, batch_size)
 
     # FileRequest
 
     async def get_download_url(self, login: str, id: str) -> dict:
         """ Gets download id with the file id """
-        if not self.sid:
-            raise exceptions.NotLoggedIn()
-        results_raw = await self.post(
-            self.jsonrpc(
-                [
-                    [1, "set_session", {"session_id": self.sid}],
-                    [2, "set_focus", {"login": login, "object": "files"}],
-                    [3, "get_file_download_url", {"id": id}],
-                ]
-            )
-        )
-        return self.pack_responses(results_raw, 2)
+        return await self.call("get_file_download_url", {"id": id}, object="files", login=login)
 
     # ForumRequest
 
     async def get_board(self, login: str) -> dict:
         """ Gets messages board for specified login """
-        if not self.sid:
-            raise exceptions.NotLoggedIn()
-        results_raw = await self.post(
-            self.jsonrpc(
-                [
-                    [1, "set_session", {"session_id": self.sid}],
-                    [2, "set_focus", {"login": login, "object": "files"}],
-                    [3, "get_entries", {}],
-                ]
-            )
-        )
-        return self.pack_responses(results_raw, 2)
+        return await self.call("get_entries", object="files", login=login, model=Entry)
 
     async def add_board_entry(self, login: str, title: str, text: str, color: str) -> dict:
         """Adds board entry for specified (group-)login.
         color must be a hexadecimal color code
         """
-        if not self.sid:
-            raise exceptions.NotLoggedIn()
-        results_raw = await self.post(
-            self.jsonrpc(
-                [
-                    [1, "set_session", {"session_id": self.sid}],
-                    [2, "set_focus", {"login": login, "object": "board"}],
-                    [
-                        3,
-                        "add_entry",
-                        {"title": title, "text": text, "color": color},
-                    ],
-                ]
-            )
-        )
-        results = [Box(res) for res in results_raw]
-        if not results[-1].result["return"] == "OK":
-            raise exceptions.error_handler(
-                results[-1].result.errno)(results_raw[-1]["result"])
-        return self.pack_responses(results_raw, 2)
+        return await self.call("add_entry", {"title": title, "text": text, "color": color}, object="board", login=login, check=True)
+
+    async def add_board_entries(self, logins: Iterable[str], title: str, text: str, color: str, chunk_size: int = 50, concurrency: int = 4) -> Dict[str, Union[dict, Exception]]:
+        """ Adds the board entry for every (group-)login, returns a report per login, see bulk """
+        return await self.bulk(logins, lambda batch, login: batch.add_board_entry(login, title, text, color), chunk_size, concurrency)
 
     # NotesRequest
 
     async def get_notes(self, login: str) -> dict:
         """ Gets notes for specified login """
-        if not self.sid:
-            raise exceptions.NotLoggedIn()
-        results_raw = await self.post(
-            self.jsonrpc(
-                [
-                    [1, "set_session", {"session_id": self.sid}],
-                    [2, "set_focus", {"login": login, "object": "notes"}],
-                    [3, "get_entries", {}],
-                ]
-            )
-        )
-        return self.pack_responses(results_raw, 2)
+        return await self.call("get_entries", object="notes", login=login, model=Entry)
 
     async def add_note(self, title: str, text: str) -> dict:
         """ adds a note """
-        if not self.sid:
-            raise exceptions.NotLoggedIn()
-        results_raw = await self.post(
-            self.jsonrpc(
-                [
-                    [1, "set_session", {"session_id": self.sid}],
-                    [2, "set_focus", {"object": "notes"}],
-                    [3, "add_entry", {"text": text, "title": title}],
-                ]
-            )
-        )
-        results = [Box(res) for res in results_raw]
-        if not results[-1].result["return"] == "OK":
-            raise exceptions.error_handler(
-                results[-1].result.errno)(results_raw[-1]["result"])
-        return self.pack_responses(results_raw, 2)
+        return await self.call("add_entry", {"text": text, "title": title}, object="notes", check=True)
 
     async def delete_note(self, id: str) -> dict:
         """ deletes a note """
-        if not self.sid:
-            raise exceptions.NotLoggedIn()
-        results_raw = await self.post(
-            self.jsonrpc(
-                [
-                    [1, "set_session", {"session_id": self.sid}],
-                    [2, "set_focus", {"object": "notes"}],
-                    [3, "delete_entry", {"id": id}],
-                ]
-            )
-        )
-        results = [Box(res) for res in results_raw]
-        if not results[-1].result["return"] == "OK":
-            raise exceptions.error_handler(
-                results[-1].result.errno)(results_raw[-1]["result"])
-        return self.pack_responses(results_raw, 2)
+        return await self.call("delete_entry", {"id": id}, object="notes", check=True)
 
     #  EmailRequest
 
     async def send_email(self, to: str, subject: str, body: str) -> dict:
         """ Sends an email """
-        if not self.sid:
-            raise exceptions.NotLoggedIn()
-        results_raw = await self.post(
-            self.jsonrpc(
-                [
-                    [1, "set_session", {"session_id": self.sid}],
-                    [2, "set_focus", {"object": "mailbox"}],
-                    [3, "send_mail", {
-                        "to": to, "subject": subject, "body_plain": body}],
-                ]
-            )
-        )
-        results = [Box(res) for res in results_raw]
-        if not results[-1].result["return"] == "OK":
-            raise exceptions.error_handler(
-                results[-1].result.errno)(results_raw[-1]["result"])
-        return self.pack_responses(results_raw, 2)
+        return await self.call("send_mail", {"to": to, "subject": subject, "body_plain": body}, object="mailbox", check=True)
+
+    async def send_emails(self, recipients: Iterable[str], subject: str, body: str, chunk_size: int = 50, concurrency: int = 4) -> Dict[str, Union[dict, Exception]]:
+        """ Sends the email to every recipient separately, returns a report per recipient, see bulk """
+        return await self.bulk(recipients, lambda batch, to: batch.send_email(to, subject, body), chunk_size, concurrency)
 
     async def get_emails(self, folder_id: str) -> dict:
         """ Gets emails from a folder id """
-        if not self.sid:
-            raise exceptions.NotLoggedIn()
-        results_raw = await self.post(
-            self.jsonrpc(
-                [
-                    [1, "set_session", {"session_id": self.sid}],
-                    [2, "set_focus", {"object": "mailbox"}],
-                    [3, "get_messages", {"folder_id": folder_id}],
-                ]
-            )
-        )
-        return self.pack_responses(results_raw, 2)
+        return await self.call("get_messages", {"folder_id": folder_id}, object="mailbox", model=MailHeader)
 
     async def read_email(self, folder_id: str, message_id: int) -> dict:
         """ reads an email with a certain message id """
-        if not self.sid:
-            raise exceptions.NotLoggedIn()
-        results_raw = await self.post(
-            self.jsonrpc(
-                [
-                    [1, "set_session", {"session_id": self.sid}],
-                    [2, "set_focus", {"object": "mailbox"}],
-                    [3, "read_message", {
-                        "folder_id": folder_id, "message_id": message_id}],
-                ]
-            )
-        )
-        results = [Box(res) for res in results_raw]
-        if not results[-1].result["return"] == "OK":
-            raise exceptions.error_handler(
-                results[-1].result.errno)(results_raw[-1])["result"]
-        return self.pack_responses(results_raw, 2)
+        return await self.call("read_message", {"folder_id": folder_id, "message_id": message_id}, object="mailbox", check=True)
 
     async def get_email_folders(self):
         """ returns the folders to get the id """
-        if not self.sid:
-            raise exceptions.NotLoggedIn()
-        results_raw = await self.post(
-            self.jsonrpc(
-                [
-                    [1, "set_session", {"session_id": self.sid}],
-                    [2, "set_focus", {"object": "mailbox"}],
-                    [3, "get_folders", {}],
-                ]
-            )
-        )
-
-        return self.pack_responses(results_raw, 2)
+        return await self.call("get_folders", object="mailbox")
 
     # MessengerRequest
 
     async def read_quickmessages(self) -> dict:
         """ returns quickmessages """
-        if not self.sid:
-            raise exceptions.NotLoggedIn()
-        results_raw = await self.post(
-            self.jsonrpc(
-                [
-                    [1, "set_session", {"session_id": self.sid}],
-                    [2, "set_focus", {"object": "messenger"}],
-                    [3, "read_quick_messages", {"export_session_file": 0}],
-                ]
-            )
-        )
-        return self.pack_responses(results_raw, 2)
+        return await self.call("read_quick_messages", {"export_session_file": 0}, object="messenger", model=QuickMessage)
 
     async def send_quickmessage(self, login: str, text: str) -> dict:
         """ Sends a quickmessage to an email holder """
-        if not self.sid:
-            raise exceptions.NotLoggedIn()
-        results_raw = await self.post(
-            self.jsonrpc(
-                [
-                    [1, "set_session", {"session_id": self.sid}],
-                    [2, "set_focus", {"object": "messenger"}],
-                    [3, "send_quick_message", {
-                        "login": login, "text": text, "import_session_file": 0}],
-                ]
-            )
-        )
-        results = [Box(res) for res in results_raw]
-        if not results[-1].result["return"] == "OK":
-            raise exceptions.error_handler(
-                results[-1].result.errno)(results_raw[-1]["result"])
-        return self.pack_responses(results_raw, 2)
+        return await self.call("send_quick_message", {"login": login, "text": text, "import_session_file": 0}, object="messenger", check=True)
+
+    async def send_quickmessages(self, logins: Iterable[str], text: str, chunk_size: int = 50, concurrency: int = 4) -> Dict[str, Union[dict, Exception]]:
+        """ Sends the quickmessage to every login, returns a report per login, see bulk """
+        return await self.bulk(logins, lambda batch, login: batch.send_quickmessage(login, text), chunk_size, concurrency)
 
     async def get_quickmessage_history(self, start_id: int) -> dict:
         """ get quickmessage history """
-        if not self.sid:
-            raise exceptions.NotLoggedIn()
-        results_raw = await self.post(
-            self.jsonrpc(
-                [
-                    [1, "set_session", {"session_id": self.sid}],
-                    [2, "set_focus", {"object": "messenger"}],
-                    [3, "get_history", {
-                        "start_id": start_id, "export_session_file": 0}],
-                ]
-            )
-        )
-        results = [Box(res) for res in results_raw]
-        if (not results[-1].result["return"] == "OK") and (results[-1].result.errno == "107" or results[-1].result.errno == "103"):
-            raise exceptions.error_handler(
-                results[-1].result.errno)(results_raw[-1]["result"])
-        return self.pack_responses(results_raw, 2)
+        results = await self.call("get_history", {"start_id": start_id, "export_session_file": 0}, object="messenger", model=QuickMessage)
+        #* only missing permissions raise, other errors are returned to the caller
+        if results["result"]["result"]["return"] != "OK" and results["result"]["result"].get("errno") in ("107", "103"):
+            self.check_result(results["result"])
+        return results
+
+    def iter_quickmessage_history(self, since_id: int = 0) -> QuickmessageHistory:
+        """Iterates over all quickmessages after since_id, use as:
+        `async for msg in client.iter_quickmessage_history(since_id)`
+        The cursor attribute of the iterator holds the id of the last message to resume from.
+        """
+        return QuickmessageHistory(self, since_id)
+
+    def watch(self, sources: Iterable[str] = ("tasks", "board", "quickmessages"), logins: Iterable[str] = None, **kwargs) -> Watcher:
+        """Watches tasks, board, notes and quickmessages of logins (default: member_of) for changes, use as:
+        `async for event in client.watch(): print(event.kind, event.source, event.login, event.id)`
+        See Watcher for the polling intervals.
+        """
+        return Watcher(self, sources, logins, **kwargs)
 
     async def group_lernsax_quickmessage_history_by_chat(self, quickmsg_history: list):
         """Groups LernSax quickmessage history by chat email and date.
@@ -347,42 +308,8 @@ class ApiClient(ABC):
         This function will group all quickmessages for same chat emails together.
         In the returned dict the messages associated to a chat are sorted by the date they were sent.
         Parse the returned data from get_lernsax_quickmessage_history() as quickmsg_history attr.
+        Use QuickmessageGrouper to group many pages of history incrementally.
         """
-        messages = quickmsg_history["result"]["result"]["messages"]
-        grouped_messages = Box({})
-        for msg in messages:
-            msg = Box(msg)
-            msg.date = int(msg.date)
-            receiving_chat_email = msg.to.login
-            receiving_chat_name = msg.to.name_hr
-            receiving_chat_type = msg.to.type
-            if not receiving_chat_email in grouped_messages:
-                grouped_messages[receiving_chat_email] = {
-                    "chat_name": receiving_chat_name,
-                    "chat_type": receiving_chat_type,
-                    "messages": [],
-                }
-            new_message = {
-                "id": msg.id,
-                "text": msg.text,
-                "date": msg.date,
-                "flags": msg.flags,
-            }
-            if (
-                len(grouped_messages[receiving_chat_email].messages) == 0
-                or msg.date >= grouped_messages[receiving_chat_email].messages[-1].date
-            ):
-                grouped_messages[receiving_chat_email].messages.append(
-                    new_message)
-            else:
-                # By async default the messages in the quickmessage history should be sorted by date. If there is a mistake in the sorting
-                # those statements are called.
-                current_index = 0
-                for existing_msg in grouped_messages[receiving_chat_email].messages:
-                    if existing_msg.date >= msg.date:
-                        grouped_messages[receiving_chat_email].messages.insert(
-                            current_index, new_message)
-                        break
-
-                    current_index += 1
-        return grouped_messages.to_dict()
+        grouper = QuickmessageGrouper()
+        grouper.feed_history(quickmsg_history)
+        return grouper.result()
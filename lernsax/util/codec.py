@@ -0,0 +1,61 @@
+"""
+JSON codecs used to encode requests and decode responses
+"""
+
+import json
+from importlib.util import find_spec
+from typing import Any, Dict, Type, Union
+
+
+class Codec:
+    """ Encodes objects to and decodes them from JSON bytes, using the standard library """
+
+    name: str = "json"
+
+    def encode(self, obj: Any) -> bytes:
+        return json.dumps(obj, separators=(",", ":")).encode()
+
+    def decode(self, data: bytes) -> Any:
+        return json.loads(data)
+
+
+class OrjsonCodec(Codec):
+    """ Codec using orjson """
+
+    name: str = "orjson"
+
+    def __init__(self) -> None:
+        import orjson
+        self.encode = orjson.dumps
+        self.decode = orjson.loads
+
+
+class MsgspecCodec(Codec):
+    """ Codec using msgspec """
+
+    name: str = "msgspec"
+
+    def __init__(self) -> None:
+        import msgspec
+        self.encode = msgspec.json.Encoder().encode
+        self.decode = msgspec.json.Decoder().decode
+
+
+CODECS: Dict[str, Type[Codec]] = {
+    "orjson": OrjsonCodec,
+    "msgspec": MsgspecCodec,
+    "json": Codec,
+}
+
+
+def get_codec(codec: Union[str, Codec] = None) -> Codec:
+    """Returns the codec with the given name.
+    Without a name the fastest installed codec is used, falling back to the standard library.
+    """
+    if isinstance(codec, Codec):
+        return codec
+    if codec is not None:
+        return CODECS[codec]()
+    for name, cls in CODECS.items():
+        if name == "json" or find_spec(name):
+            return cls()
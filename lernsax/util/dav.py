@@ -0,0 +1,391 @@
+"""
+WebDav helpers and parallel transfer engine
+"""
+
+import asyncio
+import json
+import os
+import posixpath
+import xml.etree.ElementTree as ET
+from email.utils import formatdate, parsedate_to_datetime
+from time import monotonic
+from typing import List, NamedTuple, Optional, Union
+from urllib.parse import quote, unquote, urlparse
+
+PROPFIND_BODY = (
+    '<?xml version="1.0" encoding="utf-8"?>'
+    '<d:propfind xmlns:d="DAV:"><d:prop>'
+    "<d:resourcetype/><d:getcontentlength/><d:getetag/><d:getlastmodified/>"
+    "</d:prop></d:propfind>"
+)
+
+
+MANIFEST_NAME = ".lernsax-mirror.json"
+
+
+class DavEntry(NamedTuple):
+    """ File or directory returned by PROPFIND, path is relative to the WebDav root """
+
+    path: str
+    is_dir: bool
+    size: int
+    etag: Optional[str]
+    mtime: Optional[float]
+
+
+class RangeNotSupported(Exception):
+    pass
+
+
+def dav_url(base: str, path: str) -> str:
+    """ Returns the url of path below the WebDav root base """
+    return base.rstrip("/") + quote("/" + path.lstrip("/"))
+
+
+def parse_propfind(body: bytes, base: str) -> List[DavEntry]:
+    """ Parses a PROPFIND multistatus response """
+    root_path = unquote(urlparse(base).path).rstrip("/")
+    entries = []
+    for response in ET.fromstring(body).iter("{DAV:}response"):
+        href = unquote(urlparse(response.findtext("{DAV:}href", "")).path)
+        if href.startswith(root_path):
+            href = href[len(root_path):]
+        is_dir = response.find(".//{DAV:}resourcetype/{DAV:}collection") is not None
+        size = response.findtext(".//{DAV:}getcontentlength")
+        modified = response.findtext(".//{DAV:}getlastmodified")
+        entries.append(DavEntry(
+            path="/" + href.strip("/") + ("/" if is_dir and href.strip("/") else ""),
+            is_dir=is_dir,
+            size=int(size) if size else 0,
+            etag=response.findtext(".//{DAV:}getetag"),
+            mtime=parsedate_to_datetime(modified).timestamp() if modified else None,
+        ))
+    return entries
+
+
+async def propfind(session, base: str, path: str, depth: int = 1) -> List[DavEntry]:
+    """ Lists path with a PROPFIND request of the given depth """
+    response = await session.request(
+        "PROPFIND", dav_url(base, path), data=PROPFIND_BODY,
+        headers={"Depth": str(depth), "Content-Type": "application/xml"})
+    try:
+        response.raise_for_status()
+        return parse_propfind(await response.read(), base)
+    finally:
+        response.release()
+
+
+class TransferStats:
+    """ Throughput metrics of a TransferEngine """
+
+    def __init__(self) -> None:
+        self.started: float = monotonic()
+        self.bytes_downloaded: int = 0
+        self.bytes_uploaded: int = 0
+        self.files_downloaded: int = 0
+        self.files_uploaded: int = 0
+        self.errors: int = 0
+
+    @property
+    def elapsed(self) -> float:
+        return monotonic() - self.started
+
+    @property
+    def throughput(self) -> float:
+        """ Transferred bytes per second """
+        return (self.bytes_downloaded + self.bytes_uploaded) / max(self.elapsed, 1e-9)
+
+    def to_dict(self) -> dict:
+        return {
+            "bytes_downloaded": self.bytes_downloaded,
+            "bytes_uploaded": self.bytes_uploaded,
+            "files_downloaded": self.files_downloaded,
+            "files_uploaded": self.files_uploaded,
+            "errors": self.errors,
+            "elapsed": self.elapsed,
+            "throughput": self.throughput,
+        }
+
+
+class TransferEngine:
+    """Downloads and uploads files and directory trees over a WebDav session.
+    At most `workers` requests run at once. Files larger than part_size are downloaded
+    in parallel parts with Range requests. Downloads are written to a .part file first,
+    interrupted downloads resume from the parts (or bytes) that were already written.
+    """
+
+    def __init__(self, session, base: str, workers: int = 4, part_size: int = 8 * 1024 * 1024, chunk_size: int = 64 * 1024) -> None:
+        self.session = session
+        self.base: str = base
+        self.part_size: int = part_size
+        self.chunk_size: int = chunk_size
+        self.semaphore: asyncio.Semaphore = asyncio.Semaphore(workers)
+        self.stats: TransferStats = TransferStats()
+
+    async def list(self, path: str, depth: Union[int, str] = 1) -> List[DavEntry]:
+        async with self.semaphore:
+            return await propfind(self.session, self.base, path, depth)
+
+    async def walk(self, path: str, depth: Union[int, str] = 1, max_levels: int = None, listed: set = None) -> List[DavEntry]:
+        """Lists all files and directories below path, the directories of one level are listed concurrently.
+        depth is the PROPFIND depth of each listing, "infinity" lists the whole tree in one request if the server allows it.
+        max_levels limits how many levels of directories are listed.
+        listed, if given, collects the paths (without slashes around them) of the directories whose children were all listed.
+        """
+        found, level, levels = [], [path], 0
+        while level and (max_levels is None or levels < max_levels):
+            listings = await asyncio.gather(*(self.list(directory, depth) for directory in level))
+            requested, level, levels = level, [], levels + 1
+            for directory, entries in zip(requested, listings):
+                root = directory.strip("/")
+                if listed is not None:
+                    listed.add(root)
+                for entry in entries:
+                    entry_path = entry.path.strip("/")
+                    if entry_path == root:
+                        continue
+                    found.append(entry)
+                    if entry.is_dir and depth == 1:
+                        level.append(entry.path)
+                    if listed is not None:
+                        #* deeper listings only prove the directories the server actually returned entries of
+                        listed.add(posixpath.dirname(entry_path))
+        return found
+
+    @staticmethod
+    def relative(path: str, root: str) -> str:
+        """ Returns path relative to the remote directory root """
+        return path.strip("/")[len(root.strip("/")):].strip("/")
+
+    async def download_tree(self, remote: str, local: str) -> dict:
+        """ Downloads the directory remote into local, returns the exceptions of failed files by remote path """
+        entries = await self.walk(remote)
+        for entry in entries:
+            if entry.is_dir:
+                os.makedirs(os.path.join(local, self.relative(entry.path, remote)), exist_ok=True)
+        files = [entry for entry in entries if not entry.is_dir]
+        results = await asyncio.gather(
+            *(self.download_file(entry.path, os.path.join(local, self.relative(entry.path, remote)), entry) for entry in files),
+            return_exceptions=True)
+        return {entry.path: result for entry, result in zip(files, results) if isinstance(result, Exception)}
+
+    async def mirror(self, remote: str, local: str, depth: Union[int, str] = 1, max_levels: int = None, delete: bool = True) -> dict:
+        """Mirrors the directory remote into local.
+        A manifest of etag, size and mtime of every mirrored file is kept in local/MANIFEST_NAME,
+        only files that changed since the last mirror are downloaded. Files that were removed remotely
+        are deleted locally if delete is set, files that were never mirrored are left alone.
+        Only files of directories that were listed completely are deleted, files below the levels
+        reached with depth and max_levels are kept.
+        Returns the "downloaded" and "deleted" paths, the amount of "unchanged" files and the "errors" by path.
+        """
+        manifest_path = os.path.join(local, MANIFEST_NAME)
+        manifest = {}
+        if os.path.exists(manifest_path):
+            with open(manifest_path) as file:
+                manifest = json.load(file)
+
+        listed = set()
+        entries = await self.walk(remote, depth, max_levels, listed)
+        listed = {self.relative(directory, remote) for directory in listed}
+        remote_files = {self.relative(entry.path, remote): entry for entry in entries if not entry.is_dir}
+        changed = []
+        for relative, entry in remote_files.items():
+            known = manifest.get(relative)
+            local_path = os.path.join(local, relative)
+            if known != [entry.etag, entry.size, entry.mtime] or not os.path.exists(local_path) or os.path.getsize(local_path) != entry.size:
+                changed.append((relative, entry))
+
+        results = await asyncio.gather(
+            *(self.download_file(entry.path, os.path.join(local, relative), entry) for relative, entry in changed),
+            return_exceptions=True)
+        errors = {}
+        for (relative, entry), result in zip(changed, results):
+            if isinstance(result, Exception):
+                errors[relative] = result
+                manifest.pop(relative, None)
+            else:
+                manifest[relative] = [entry.etag, entry.size, entry.mtime]
+
+        deleted = []
+        if delete:
+            removed = [
+                relative for relative in manifest
+                if relative not in remote_files and posixpath.dirname(relative) in listed
+            ]
+            for relative in removed:
+                local_path = os.path.join(local, relative)
+                if os.path.exists(local_path):
+                    os.remove(local_path)
+                deleted.append(relative)
+                del manifest[relative]
+                #* remove directories that became empty
+                directory = os.path.dirname(local_path)
+                while os.path.abspath(directory) != os.path.abspath(local) and os.path.isdir(directory) and not os.listdir(directory):
+                    os.rmdir(directory)
+                    directory = os.path.dirname(directory)
+
+        os.makedirs(local, exist_ok=True)
+        with open(manifest_path + ".tmp", "w") as file:
+            json.dump(manifest, file)
+        os.replace(manifest_path + ".tmp", manifest_path)
+        return {
+            "downloaded": [relative for (relative, _), result in zip(changed, results) if not isinstance(result, Exception)],
+            "deleted": deleted,
+            "unchanged": len(remote_files) - len(changed),
+            "errors": errors,
+        }
+
+    async def upload_tree(self, local: str, remote: str) -> dict:
+        """ Uploads the directory local into remote, returns the exceptions of failed files by local path """
+        files = []
+        await self.make_directory(remote)
+        for directory, directories, names in os.walk(local):
+            relative = os.path.relpath(directory, local)
+            remote_directory = remote.rstrip("/") + ("" if relative == "." else "/" + relative.replace(os.sep, "/"))
+            for name in directories:
+                await self.make_directory(f"{remote_directory}/{name}")
+            files.extend((os.path.join(directory, name), f"{remote_directory}/{name}") for name in names)
+        results = await asyncio.gather(*(self.upload_file(*paths) for paths in files), return_exceptions=True)
+        return {paths[0]: result for paths, result in zip(files, results) if isinstance(result, Exception)}
+
+    async def download_file(self, remote: str, local: str, entry: DavEntry = None) -> None:
+        """ Downloads remote to local, in parallel parts if it is large """
+        if entry is None:
+            entry = (await self.list(remote, depth=0))[0]
+        os.makedirs(os.path.dirname(os.path.abspath(local)), exist_ok=True)
+        part_file = local + ".part"
+        try:
+            if entry.size > self.part_size:
+                try:
+                    await self.download_parts(remote, part_file, entry)
+                except RangeNotSupported:
+                    await self.download_stream(remote, part_file, entry)
+            else:
+                await self.download_stream(remote, part_file, entry)
+        except Exception:
+            self.stats.errors += 1
+            raise
+        os.replace(part_file, local)
+        if os.path.exists(part_file + ".json"):
+            os.remove(part_file + ".json")
+        if entry.mtime:
+            os.utime(local, (entry.mtime, entry.mtime))
+        self.stats.files_downloaded += 1
+
+    async def download_stream(self, remote: str, part_file: str, entry: DavEntry) -> None:
+        """Downloads in a single stream, resuming after the bytes already in part_file.
+        Only bytes of the same version of the file are resumed, the etag (or date) they were written with is
+        recorded next to part_file and sent as If-Range, a changed file is downloaded again from the start.
+        """
+        state_file = part_file + ".json"
+        #* weak etags can't be used with If-Range
+        validator = entry.etag if entry.etag and not entry.etag.startswith("W/") else (
+            formatdate(entry.mtime, usegmt=True) if entry.mtime else None)
+        offset = 0
+        if validator and os.path.exists(part_file) and os.path.exists(state_file):
+            with open(state_file) as file:
+                state = json.load(file)
+            if state.get("stream") == validator and state.get("size") == entry.size:
+                offset = os.path.getsize(part_file)
+        if offset >= entry.size:
+            offset = 0
+        headers = {"Range": f"bytes={offset}-", "If-Range": validator} if offset else {}
+        async with self.semaphore:
+            response = await self.session.request("GET", dav_url(self.base, remote), headers=headers)
+            try:
+                response.raise_for_status()
+                if response.status != 206:
+                    offset = 0
+                if not offset:
+                    with open(state_file, "w") as file:
+                        json.dump({"stream": validator, "size": entry.size}, file)
+                with open(part_file, "r+b" if offset else "wb") as file:
+                    file.seek(offset)
+                    async for chunk in response.content.iter_chunked(self.chunk_size):
+                        file.write(chunk)
+                        self.stats.bytes_downloaded += len(chunk)
+            finally:
+                response.release()
+
+    async def download_parts(self, remote: str, part_file: str, entry: DavEntry) -> None:
+        """ Downloads Range parts concurrently, finished parts are recorded next to part_file """
+        state_file = part_file + ".json"
+        done = set()
+        if os.path.exists(state_file) and os.path.exists(part_file):
+            with open(state_file) as file:
+                state = json.load(file)
+            if state.get("size") == entry.size and state.get("etag") == entry.etag:
+                done = set(state.get("done", []))
+        if not done:
+            with open(part_file, "wb") as file:
+                file.truncate(entry.size)
+
+        def save_state() -> None:
+            with open(state_file, "w") as file:
+                json.dump({"size": entry.size, "etag": entry.etag, "done": sorted(done)}, file)
+
+        async def part(index: int) -> None:
+            start = index * self.part_size
+            end = min(start + self.part_size, entry.size) - 1
+            async with self.semaphore:
+                response = await self.session.request(
+                    "GET", dav_url(self.base, remote), headers={"Range": f"bytes={start}-{end}"})
+                try:
+                    response.raise_for_status()
+                    if response.status != 206:
+                        raise RangeNotSupported(remote)
+                    with open(part_file, "r+b") as file:
+                        file.seek(start)
+                        async for chunk in response.content.iter_chunked(self.chunk_size):
+                            file.write(chunk)
+                            self.stats.bytes_downloaded += len(chunk)
+                finally:
+                    response.release()
+            done.add(index)
+            save_state()
+
+        parts = -(-entry.size // self.part_size)
+        tasks = [asyncio.ensure_future(part(index)) for index in range(parts) if index not in done]
+        try:
+            await asyncio.gather(*tasks)
+        except BaseException:
+            #* running parts would keep writing part_file while the caller falls back or retries
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+
+    async def upload_file(self, local: str, remote: str) -> None:
+        """ Uploads local to remote in a single streamed PUT """
+
+        async def sender():
+            with open(local, "rb") as file:
+                while True:
+                    chunk = file.read(self.chunk_size)
+                    if not chunk:
+                        break
+                    self.stats.bytes_uploaded += len(chunk)
+                    yield chunk
+
+        async with self.semaphore:
+            response = await self.session.request(
+                "PUT", dav_url(self.base, remote), data=sender(),
+                headers={"Content-Length": str(os.path.getsize(local))})
+            try:
+                response.raise_for_status()
+            except Exception:
+                self.stats.errors += 1
+                raise
+            finally:
+                response.release()
+        self.stats.files_uploaded += 1
+
+    async def make_directory(self, remote: str) -> None:
+        """ Creates the remote directory if it doesn't exist """
+        response = await self.session.request("MKCOL", dav_url(self.base, remote.rstrip("/") + "/"))
+        try:
+            #* 405 means the directory already exists
+            if response.status != 405:
+                response.raise_for_status()
+        finally:
+            response.release()
@@ -0,0 +1,171 @@
+"""
+Local directory of group members with an optional SQLite copy
+"""
+
+import hashlib
+import json
+import sqlite3
+from bisect import bisect_left
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+
+def members_fingerprint(members: List[dict]) -> str:
+    """ Returns a digest of the logins, names and types of members that is stable across processes """
+    rows = sorted((member.get("login"), member.get("name_hr"), member.get("type")) for member in members)
+    return hashlib.blake2b(json.dumps(rows).encode(), digest_size=8).hexdigest()
+
+
+class Directory:
+    """Index of the members of groups for lookups without requests.
+    refresh fetches the members of all groups (default: member_of of the client) with batched get_members calls
+    and only reindexes groups whose member list changed.
+    users maps logins to {"name", "type"}, groups maps group logins to member logins.
+    With a path the index is kept in an SQLite database and loaded from it on creation.
+    """
+
+    def __init__(self, client, path: str = None, batch_size: int = 50) -> None:
+        self.client = client
+        self.batch_size: int = batch_size
+        self.users: Dict[str, dict] = {}
+        self.groups: Dict[str, List[str]] = {}
+        self.fingerprints: Dict[str, str] = {}
+        self.memberships: Dict[str, Set[str]] = {}
+        self.names: Dict[str, Set[str]] = {}
+        #* sorted (name, login) for prefix search, rebuilt after changes
+        self.sorted_names: Optional[List[Tuple[str, str]]] = None
+        self.db: Optional[sqlite3.Connection] = None
+        if path is not None:
+            self.db = sqlite3.connect(path)
+            self.db.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS groups (login TEXT PRIMARY KEY, fingerprint TEXT, members TEXT);
+                CREATE TABLE IF NOT EXISTS users (login TEXT PRIMARY KEY, name TEXT, type TEXT);
+                """
+            )
+            self.load()
+
+    def close(self) -> None:
+        if self.db is not None:
+            self.db.close()
+
+    def load(self) -> None:
+        """ Fills the index from the database """
+        for login, name, type in self.db.execute("SELECT login, name, type FROM users"):
+            self.set_user(login, name, json.loads(type))
+        for group, fingerprint, members in self.db.execute("SELECT login, fingerprint, members FROM groups"):
+            self.groups[group], self.fingerprints[group] = json.loads(members), fingerprint
+            for login in self.groups[group]:
+                self.memberships.setdefault(login, set()).add(group)
+
+    #* lookups
+
+    def user(self, login: str) -> Optional[dict]:
+        """ Returns {"name", "type"} of the login """
+        return self.users.get(login)
+
+    def members(self, group: str) -> List[str]:
+        """ Returns the member logins of the group """
+        return self.groups.get(group, [])
+
+    def groups_of(self, login: str) -> Set[str]:
+        """ Returns the indexed groups the login is a member of """
+        return self.memberships.get(login, set())
+
+    def find(self, name: str) -> Set[str]:
+        """ Returns the logins with the name, ignoring case """
+        return self.names.get(name.casefold(), set())
+
+    def search(self, prefix: str, limit: int = 20) -> List[str]:
+        """ Returns up to limit logins whose name starts with prefix, ignoring case """
+        if self.sorted_names is None:
+            self.sorted_names = sorted((name, login) for name, logins in self.names.items() for login in logins)
+        prefix = prefix.casefold()
+        found = []
+        for name, login in self.sorted_names[bisect_left(self.sorted_names, (prefix, "")):]:
+            if not name.startswith(prefix) or len(found) >= limit:
+                break
+            found.append(login)
+        return found
+
+    #* updates
+
+    def set_user(self, login: str, name: Optional[str], type) -> None:
+        old = self.users.get(login)
+        if old is not None and old["name"] != name and old["name"]:
+            self.names.get(old["name"].casefold(), set()).discard(login)
+        self.users[login] = {"name": name, "type": type}
+        if name:
+            self.names.setdefault(name.casefold(), set()).add(login)
+        self.sorted_names = None
+
+    def remove_user(self, login: str) -> None:
+        user = self.users.pop(login, None)
+        if user is not None and user["name"]:
+            self.names.get(user["name"].casefold(), set()).discard(login)
+        self.memberships.pop(login, None)
+        self.sorted_names = None
+
+    def set_members(self, group: str, members: List[dict], fingerprint: str) -> Set[str]:
+        """ Replaces the members of group, returns the logins that aren't in any group anymore """
+        logins = [member["login"] for member in members if member.get("login")]
+        orphans = set()
+        for login in set(self.groups.get(group, [])) - set(logins):
+            self.memberships.get(login, set()).discard(group)
+            if not self.memberships.get(login):
+                orphans.add(login)
+        for member in members:
+            if member.get("login"):
+                self.set_user(member["login"], member.get("name_hr"), member.get("type"))
+                self.memberships.setdefault(member["login"], set()).add(group)
+        self.groups[group], self.fingerprints[group] = logins, fingerprint
+        for login in orphans:
+            self.remove_user(login)
+        return orphans
+
+    async def fetch_members(self, groups: List[str]) -> Tuple[Dict[str, list], Dict[str, Exception]]:
+        """ Fetches the members of groups with get_members calls, batch_size of them per request """
+        report = await self.client.bulk(groups, lambda batch, group: batch.get_members(group), self.batch_size)
+        fetched, errors = {}, {}
+        for group, result in report.items():
+            if isinstance(result, Exception):
+                errors[group] = result
+            else:
+                fetched[group] = result["result"]["result"].get("users", [])
+        return fetched, errors
+
+    async def refresh(self, groups: Iterable[str] = None) -> dict:
+        """Fetches the members of groups (default: member_of of the client, dropping groups the client left)
+        and updates the index. Returns the "changed" and "removed" groups, the amount of "unchanged" groups
+        and the "errors" of groups that couldn't be fetched, those keep their indexed members.
+        """
+        full = groups is None
+        groups = list(dict.fromkeys(self.client.member_of if full else groups))
+        fetched, errors = await self.fetch_members(groups)
+        changed, orphans = [], set()
+        for group, members in fetched.items():
+            fingerprint = members_fingerprint(members)
+            if self.fingerprints.get(group) != fingerprint:
+                orphans |= self.set_members(group, members, fingerprint)
+                changed.append(group)
+        removed = [group for group in self.groups if group not in groups] if full else []
+        for group in removed:
+            orphans |= self.set_members(group, [], "")
+            del self.groups[group], self.fingerprints[group]
+        if self.db is not None and (changed or removed):
+            self.save(changed, removed, orphans - set(self.users))
+        return {"changed": changed, "removed": removed, "unchanged": len(fetched) - len(changed), "errors": errors}
+
+    def save(self, changed: List[str], removed: List[str], orphans: Set[str]) -> None:
+        """ Writes the changed and removed groups, their members and the users that left all groups to the database """
+        with self.db:
+            self.db.executemany("DELETE FROM groups WHERE login = ?", [(group,) for group in removed])
+            self.db.executemany("DELETE FROM users WHERE login = ?", [(login,) for login in orphans])
+            self.db.executemany(
+                "INSERT OR REPLACE INTO groups VALUES (?, ?, ?)",
+                [(group, self.fingerprints[group], json.dumps(self.groups[group])) for group in changed],
+            )
+            logins = {login for group in changed for login in self.groups[group]}
+            self.db.executemany(
+                "INSERT OR REPLACE INTO users VALUES (?, ?, ?)",
+                [(login, self.users[login]["name"], json.dumps(self.users[login]["type"])) for login in logins],
+            )
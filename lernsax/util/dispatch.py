@@ -0,0 +1,95 @@
+"""
+Automatic micro batching of concurrent jsonrpc requests
+"""
+
+import asyncio
+from typing import Awaitable, Callable, List, Optional, Set, Tuple
+
+
+class Dispatcher:
+    """Collects the jsonrpc requests issued within max_delay seconds (or until max_size calls are queued)
+    and sends them as one ordered request. Call ids are remapped so every caller gets back its own responses.
+    Every request keeps its own set_session and set_focus calls, so requests of different sessions can be merged.
+    """
+
+    def __init__(self, send: Callable[[list], Awaitable[list]], max_size: int = 50, max_delay: float = 0.002) -> None:
+        self.send: Callable[[list], Awaitable[list]] = send
+        self.max_size: int = max_size
+        self.max_delay: float = max_delay
+        self.pending: List[Tuple[list, asyncio.Future]] = []
+        self.size: int = 0
+        self.timer: Optional[asyncio.TimerHandle] = None
+        self.tasks: Set[asyncio.Task] = set()
+
+    async def submit(self, data: list) -> list:
+        """ Queues a jsonrpc request and returns its responses once the merged request is done """
+        future = asyncio.get_running_loop().create_future()
+        self.pending.append((data, future))
+        self.size += len(data)
+        if self.size >= self.max_size:
+            self.flush()
+        elif self.timer is None:
+            self.timer = asyncio.get_running_loop().call_later(self.max_delay, self.flush)
+        return await future
+
+    def flush(self) -> None:
+        """ Sends all queued requests now """
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        if not self.pending:
+            return
+        pending, self.pending, self.size = self.pending, [], 0
+        task = asyncio.get_running_loop().create_task(self.dispatch(pending))
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+    async def dispatch(self, pending: List[Tuple[list, asyncio.Future]]) -> None:
+        #* a single request doesn't need any remapping
+        if len(pending) == 1:
+            data, future = pending[0]
+            try:
+                results = await self.send(data)
+            except Exception as e:
+                if not future.done():
+                    future.set_exception(e)
+            except BaseException:
+                #* a cancelled dispatch must not leave its submitters waiting
+                future.cancel()
+                raise
+            else:
+                if not future.done():
+                    future.set_result(results)
+            return
+
+        merged, routes = [], {}
+        for index, (data, _) in enumerate(pending):
+            for call in data:
+                routes[len(merged) + 1] = (index, call["id"])
+                merged.append({**call, "id": len(merged) + 1})
+        try:
+            results = await self.send(merged)
+        except Exception as e:
+            for _, future in pending:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        except BaseException:
+            for _, future in pending:
+                future.cancel()
+            raise
+
+        split = [[] for _ in pending]
+        for res in results:
+            route = routes.get(res.get("id"))
+            if route is not None:
+                split[route[0]].append({**res, "id": route[1]})
+        for (_, future), results in zip(pending, split):
+            if not future.done():
+                future.set_result(results)
+
+    async def close(self) -> None:
+        """ Sends the remaining requests and waits for all of them """
+        self.flush()
+        if self.tasks:
+            await asyncio.gather(*self.tasks, return_exceptions=True)
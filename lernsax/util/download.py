@@ -0,0 +1,54 @@
+"""
+Streaming downloads to files, file descriptors and async sinks
+"""
+
+import asyncio
+import inspect
+import os
+from typing import Any, Optional
+from .limits import TransferLimiter
+
+
+def download_url_of(result: dict) -> str:
+    """ Returns the download url from a get_download_url result """
+    result = result["result"]["result"]
+    for key in ("download_url", "url"):
+        if result.get(key):
+            return result[key]
+    return (result.get("file") or {}).get("download_url")
+
+
+async def write_chunk(sink: Any, chunk: bytes) -> None:
+    """Writes chunk to a file descriptor, asyncio.StreamWriter, object with a write method or callable.
+    Awaitable results of write methods and callables are awaited.
+    """
+    if isinstance(sink, int):
+        view = memoryview(chunk)
+        while view:
+            view = view[os.write(sink, view):]
+        return
+    if isinstance(sink, asyncio.StreamWriter):
+        sink.write(chunk)
+        await sink.drain()
+        return
+    result = sink.write(chunk) if hasattr(sink, "write") else sink(chunk)
+    if inspect.isawaitable(result):
+        await result
+
+
+async def stream_response(response, dest: Any, chunk_size: int = 64 * 1024, limiter: Optional[TransferLimiter] = None) -> int:
+    """Streams the body of response to dest in chunks of chunk_size, returns the amount of bytes written.
+    dest may be a path, a file descriptor, an asyncio.StreamWriter, an object with a write method or a callable.
+    """
+    written = 0
+    file = open(dest, "wb") if isinstance(dest, (str, os.PathLike)) else None
+    try:
+        async for chunk in response.content.iter_chunked(chunk_size):
+            if limiter is not None:
+                await limiter.throttle(len(chunk))
+            await write_chunk(file if file is not None else dest, chunk)
+            written += len(chunk)
+    finally:
+        if file is not None:
+            file.close()
+    return written
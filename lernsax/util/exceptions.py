@@ -38,6 +38,16 @@ class UnkownError(Exception):
         Exception.__init__(*args, **kwargs)
 
 
+class CircuitOpen(Exception):
+    def __init__(*args, **kwargs):
+        Exception.__init__(*args, **kwargs)
+
+
+class WebDavDisabled(Exception):
+    def __init__(*args, **kwargs):
+        Exception.__init__(*args, **kwargs)
+
+
 def error_handler(errno: str) -> Exception:
     """
     returns an Exception for the given error code
@@ -0,0 +1,67 @@
+"""
+Grouping of quickmessage histories by chat
+"""
+
+from operator import itemgetter
+from typing import AsyncIterable, Dict, Iterable, Set, Union
+from .models import QuickMessage
+
+_by_date = itemgetter("date")
+
+
+class QuickmessageGrouper:
+    """Groups quickmessages by chat login, the messages of every chat are sorted by date.
+    Messages can be fed page by page. Messages arriving in order are appended,
+    chats that received a message out of order are sorted once when the result is built.
+    """
+
+    def __init__(self) -> None:
+        self.chats: Dict[str, dict] = {}
+        self.unsorted: Set[str] = set()
+
+    def feed(self, messages: Iterable[Union[dict, QuickMessage]]) -> None:
+        """ Adds messages (dicts from the api or QuickMessage models) """
+        chats, unsorted = self.chats, self.unsorted
+        for msg in messages:
+            if isinstance(msg, QuickMessage):
+                chat, name, type = msg.chat, msg.chat_name, msg.chat_type
+                new_message = {"id": msg.id, "text": msg.text, "date": msg.date, "flags": list(msg.flags)}
+            else:
+                to = msg["to"]
+                chat, name, type = to["login"], to["name_hr"], to["type"]
+                new_message = {"id": msg["id"], "text": msg["text"], "date": int(msg["date"]), "flags": msg["flags"]}
+
+            group = chats.get(chat)
+            if group is None:
+                group = chats[chat] = {"chat_name": name, "chat_type": type, "messages": []}
+            messages_of_chat = group["messages"]
+            if messages_of_chat and new_message["date"] < messages_of_chat[-1]["date"]:
+                unsorted.add(chat)
+            messages_of_chat.append(new_message)
+
+    def feed_history(self, quickmsg_history: dict) -> None:
+        """ Adds the messages of a result of get_quickmessage_history """
+        self.feed(quickmsg_history["result"]["result"].get("messages", []))
+
+    async def feed_pages(self, pages: Union[Iterable, AsyncIterable]) -> None:
+        """ Adds pages of messages or get_quickmessage_history results from an iterable or async iterable """
+        if hasattr(pages, "__aiter__"):
+            async for page in pages:
+                self.feed_page(page)
+        else:
+            for page in pages:
+                self.feed_page(page)
+
+    def feed_page(self, page: Union[dict, Iterable]) -> None:
+        if isinstance(page, dict):
+            self.feed_history(page)
+        else:
+            self.feed(page)
+
+    def result(self) -> Dict[str, dict]:
+        """ Returns the grouped messages, sorting the chats that are out of order """
+        for chat in self.unsorted:
+            #* sort is stable, messages with the same date keep their order
+            self.chats[chat]["messages"].sort(key=_by_date)
+        self.unsorted.clear()
+        return self.chats
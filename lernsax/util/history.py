@@ -0,0 +1,75 @@
+"""
+Paginated iteration over the quickmessage history
+"""
+
+import asyncio
+from collections import deque
+from typing import Deque, Optional, Union
+from .models import QuickMessage
+
+
+def _message_id(msg: Union[dict, QuickMessage]) -> int:
+    return msg.id if isinstance(msg, QuickMessage) else int(msg["id"])
+
+
+class QuickmessageHistory:
+    """Async iterator yielding every quickmessage after since_id, one at a time.
+    Pages are fetched with get_quickmessage_history, the next page is prefetched while the current one is consumed.
+    cursor is the id of the last yielded message, store it and pass it as since_id to resume later.
+    """
+
+    def __init__(self, client, since_id: int = 0) -> None:
+        self.client = client
+        self.cursor: int = int(since_id)
+        self.buffer: Deque[Union[dict, QuickMessage]] = deque()
+        self.prefetch: Optional[asyncio.Task] = None
+        #* highest id that was requested so far
+        self.fetched: int = self.cursor
+        self.done: bool = False
+
+    def __aiter__(self) -> "QuickmessageHistory":
+        return self
+
+    async def __anext__(self) -> Union[dict, QuickMessage]:
+        while not self.buffer:
+            if self.done:
+                raise StopAsyncIteration
+            if self.prefetch is None:
+                self.start_prefetch()
+            #* a failed page raises here and is fetched again by the next call
+            prefetch, self.prefetch = self.prefetch, None
+            page = await prefetch
+            if page:
+                self.buffer.extend(page)
+                self.start_prefetch()
+            else:
+                self.done = True
+        msg = self.buffer.popleft()
+        self.cursor = max(self.cursor, _message_id(msg))
+        return msg
+
+    def start_prefetch(self) -> None:
+        self.prefetch = asyncio.get_running_loop().create_task(self.fetch(self.fetched))
+
+    async def fetch(self, start_id: int) -> list:
+        """Fetches the page after start_id, only messages with a higher id are returned, sorted by id.
+        A page that didn't return OK raises instead of ending the iteration.
+        """
+        results = await self.client.get_quickmessage_history(start_id)
+        for response in (*results["helpers"], results["result"]):
+            self.client.check_result(response)
+        messages = results["result"]["result"].get("messages") or []
+        #* the cursor only moves forward, messages are yielded in id order so resuming skips none
+        page = sorted((msg for msg in messages if _message_id(msg) > start_id), key=_message_id)
+        if page:
+            self.fetched = max(self.fetched, max(_message_id(msg) for msg in page))
+        return page
+
+    async def aclose(self) -> None:
+        """ Stops iterating and cancels the prefetch """
+        self.done = True
+        self.buffer.clear()
+        if self.prefetch is not None:
+            self.prefetch.cancel()
+            await asyncio.gather(self.prefetch, return_exceptions=True)
+            self.prefetch = None
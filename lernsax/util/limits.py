@@ -0,0 +1,234 @@
+"""
+Concurrency limits shared by many clients
+"""
+
+import asyncio
+import heapq
+from collections import deque
+from contextlib import asynccontextmanager
+from itertools import count
+from time import monotonic
+from typing import Deque, Dict, Hashable, List, Optional, Tuple
+
+
+class FairLimiter:
+    """Limits the amount of concurrent operations.
+    Waiting operations are granted round robin over their keys (e.g. accounts),
+    so a single key with many queued operations can't starve the others.
+    """
+
+    def __init__(self, limit: int) -> None:
+        self.limit: int = limit
+        self.active: int = 0
+        #* insertion order is used as the round robin ring
+        self.waiting: Dict[Hashable, Deque[asyncio.Future]] = {}
+
+    @property
+    def queued(self) -> int:
+        """ Amount of operations waiting for a slot """
+        return sum(len(queue) for queue in self.waiting.values())
+
+    async def acquire(self, key: Hashable) -> None:
+        """ Waits until a slot is granted to key """
+        if self.active < self.limit and not self.waiting:
+            self.active += 1
+            return
+        future = asyncio.get_running_loop().create_future()
+        self.waiting.setdefault(key, deque()).append(future)
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                #* the slot was granted right before the cancellation
+                self.release()
+            else:
+                queue = self.waiting.get(key)
+                if queue is not None and future in queue:
+                    queue.remove(future)
+                    if not queue:
+                        del self.waiting[key]
+            raise
+
+    def release(self) -> None:
+        """ Frees a slot and grants it to the next key """
+        self.active -= 1
+        while self.active < self.limit and self.waiting:
+            key = next(iter(self.waiting))
+            queue = self.waiting.pop(key)
+            future = queue.popleft()
+            if queue:
+                #* move the key to the end of the ring
+                self.waiting[key] = queue
+            if not future.done():
+                self.active += 1
+                future.set_result(None)
+
+    @asynccontextmanager
+    async def slot(self, key: Hashable):
+        """ Holds a slot for key while inside the context """
+        await self.acquire(key)
+        try:
+            yield
+        finally:
+            self.release()
+
+
+class TokenBucket:
+    """Token bucket refilled with rate tokens per second up to capacity.
+    Waiters are served in order, a request larger than the capacity waits for a full bucket and leaves it in debt.
+    """
+
+    def __init__(self, rate: float, capacity: float = None) -> None:
+        self.rate: float = rate
+        self.capacity: float = capacity if capacity is not None else rate
+        self.tokens: float = self.capacity
+        self.updated: float = monotonic()
+        self.lock: asyncio.Lock = asyncio.Lock()
+
+    def refill(self) -> None:
+        now = monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def consume(self, amount: float = 1) -> float:
+        """ Waits until amount tokens are available and takes them, returns the seconds waited """
+        waited = 0.0
+        async with self.lock:
+            self.refill()
+            needed = min(amount, self.capacity)
+            while self.tokens < needed:
+                delay = (needed - self.tokens) / self.rate
+                await asyncio.sleep(delay)
+                waited += delay
+                self.refill()
+            self.tokens -= amount
+        return waited
+
+
+class TransferLimiter:
+    """ Limits concurrent transfers and their combined bandwidth in bytes per second """
+
+    def __init__(self, concurrency: int = 8, bytes_per_second: float = None) -> None:
+        self.semaphore: asyncio.Semaphore = asyncio.Semaphore(concurrency)
+        self.bucket: Optional[TokenBucket] = TokenBucket(bytes_per_second) if bytes_per_second else None
+
+    @asynccontextmanager
+    async def slot(self):
+        """ Holds one of the concurrent transfer slots """
+        async with self.semaphore:
+            yield
+
+    async def throttle(self, amount: int) -> None:
+        """ Waits until amount bytes may be transferred """
+        if self.bucket is not None:
+            await self.bucket.consume(amount)
+
+
+#* priority classes of PriorityRateLimiter, lower values are served first
+INTERACTIVE, NORMAL, BULK = 0, 1, 2
+PRIORITY_NAMES = ("interactive", "normal", "bulk")
+
+INTERACTIVE_METHODS = frozenset({"login", "send_quick_message", "read_quick_messages", "read_message", "send_mail", "get_file_download_url"})
+BULK_METHODS = frozenset({"get_entries", "get_messages", "get_folders", "get_history", "get_users"})
+
+def priority_of(data: list) -> int:
+    """ Returns the priority class of a jsonrpc request from the methods it calls """
+    methods = {call["method"] for call in data}
+    if methods & INTERACTIVE_METHODS:
+        return INTERACTIVE
+    if methods & BULK_METHODS:
+        return BULK
+    return NORMAL
+
+
+class PriorityRateLimiter:
+    """Token bucket limiting requests to rate per second with bursts of up to burst requests.
+    Waiting requests are served by priority class (INTERACTIVE, NORMAL, BULK), in order within a class.
+    Keeps queue depth and wait time metrics per class.
+    Owned by a Client or ClientPool, waiters and the refill timer belong to the event loop that is running.
+    """
+
+    def __init__(self, rate: float, burst: float = None) -> None:
+        self.rate: float = rate
+        self.capacity: float = burst if burst is not None else max(1.0, rate)
+        self.tokens: float = self.capacity
+        self.updated: float = monotonic()
+        self.waiting: List[Tuple[int, int, asyncio.Future]] = []
+        self.counter = count()
+        self.timer: Optional[asyncio.TimerHandle] = None
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.requests: List[int] = [0, 0, 0]
+        self.wait_total: List[float] = [0.0, 0.0, 0.0]
+        self.wait_max: List[float] = [0.0, 0.0, 0.0]
+
+    def refill(self) -> None:
+        now = monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, priority: int = NORMAL) -> float:
+        """ Waits for a token, returns the seconds waited """
+        loop = asyncio.get_running_loop()
+        if loop is not self.loop:
+            #* the timer and waiters of a previous loop never fire
+            self.loop, self.timer, self.waiting = loop, None, []
+        self.refill()
+        if not self.waiting and self.tokens >= 1:
+            self.tokens -= 1
+            self.record(priority, 0.0)
+            return 0.0
+        future = loop.create_future()
+        started = monotonic()
+        heapq.heappush(self.waiting, (priority, next(self.counter), future))
+        self.schedule()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                #* the token was granted right before the cancellation
+                self.tokens += 1
+            raise
+        waited = monotonic() - started
+        self.record(priority, waited)
+        return waited
+
+    def schedule(self) -> None:
+        if self.timer is None and self.waiting:
+            delay = max(0.0, (1 - self.tokens) / self.rate)
+            self.timer = self.loop.call_later(delay, self.pump)
+
+    def pump(self) -> None:
+        self.timer = None
+        self.refill()
+        while self.waiting and (self.tokens >= 1 or self.waiting[0][2].done()):
+            future = heapq.heappop(self.waiting)[2]
+            if future.done():
+                continue
+            self.tokens -= 1
+            future.set_result(None)
+        self.schedule()
+
+    def record(self, priority: int, waited: float) -> None:
+        self.requests[priority] += 1
+        self.wait_total[priority] += waited
+        self.wait_max[priority] = max(self.wait_max[priority], waited)
+
+    @property
+    def queued(self) -> int:
+        return sum(1 for _, _, future in self.waiting if not future.done())
+
+    def stats(self) -> dict:
+        """ Returns queue depth, request counts and average/maximum wait per priority class """
+        queued = [0, 0, 0]
+        for priority, _, future in self.waiting:
+            if not future.done():
+                queued[priority] += 1
+        return {
+            name: {
+                "queued": queued[priority],
+                "requests": self.requests[priority],
+                "wait_avg": self.wait_total[priority] / self.requests[priority] if self.requests[priority] else 0.0,
+                "wait_max": self.wait_max[priority],
+            }
+            for priority, name in enumerate(PRIORITY_NAMES)
+        }
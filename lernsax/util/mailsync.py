@@ -0,0 +1,119 @@
+"""
+Incremental mailbox synchronisation with a local SQLite index
+"""
+
+import json
+import sqlite3
+from typing import Dict, Iterable, List, Tuple
+
+
+class MailboxSync:
+    """Keeps a local index of mail folders, message ids and flags.
+    A sync lists all folders in one request and the messages of all folders in one batched request,
+    then reads only messages missing from the index with batched read_message calls.
+    Messages whose flags changed are only updated in the index.
+    With store_messages the read messages are kept in the index as well.
+    """
+
+    def __init__(self, client, path: str = ":memory:", batch_size: int = 50, store_messages: bool = False) -> None:
+        self.client = client
+        self.batch_size: int = batch_size
+        self.store_messages: bool = store_messages
+        self.db: sqlite3.Connection = sqlite3.connect(path)
+        self.db.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS folders (id TEXT PRIMARY KEY, name TEXT);
+            CREATE TABLE IF NOT EXISTS messages (
+                folder_id TEXT, id INTEGER, flags TEXT, message TEXT,
+                PRIMARY KEY (folder_id, id)
+            );
+            """
+        )
+
+    def close(self) -> None:
+        self.db.close()
+
+    def folders(self) -> Dict[str, str]:
+        """ Returns the indexed folders as {id: name} """
+        return dict(self.db.execute("SELECT id, name FROM folders"))
+
+    def message_ids(self, folder_id: str) -> List[int]:
+        """ Returns the indexed message ids of a folder """
+        return [row[0] for row in self.db.execute("SELECT id FROM messages WHERE folder_id = ? ORDER BY id", (folder_id,))]
+
+    def message(self, folder_id: str, id: int) -> dict:
+        """ Returns a stored message, only available with store_messages """
+        row = self.db.execute("SELECT message FROM messages WHERE folder_id = ? AND id = ?", (folder_id, id)).fetchone()
+        return json.loads(row[0]) if row and row[0] else None
+
+    async def list_messages(self, folder_ids: Iterable[str]) -> Dict[str, list]:
+        """ Lists the messages of all folders in one batched request """
+        async with self.client.batch() as batch:
+            futures = {folder_id: batch.get_emails(folder_id) for folder_id in folder_ids}
+        listed = {}
+        for folder_id, future in futures.items():
+            result = future.result()["result"]["result"]
+            if result.get("return") == "OK":
+                listed[folder_id] = result.get("messages") or []
+        return listed
+
+    async def read_messages(self, wanted: List[Tuple[str, int]]) -> Tuple[Dict[Tuple[str, int], dict], Dict[Tuple[str, int], Exception]]:
+        """ Reads messages with batched read_message calls """
+        read, errors = {}, {}
+        for i in range(0, len(wanted), self.batch_size):
+            async with self.client.batch() as batch:
+                futures = {key: batch.read_email(*key) for key in wanted[i:i + self.batch_size]}
+            for key, future in futures.items():
+                try:
+                    read[key] = future.result()["result"]["result"]
+                except Exception as e:
+                    errors[key] = e
+        return read, errors
+
+    async def sync(self) -> dict:
+        """Synchronises the index with the mailbox.
+        Returns a dict with the read "new" messages, the keys of messages with "changed" flags,
+        the keys of "removed" messages and read "errors", keys are (folder_id, message_id).
+        """
+        folders_response = (await self.client.get_email_folders())["result"]
+        #* an empty folder list from a failed call would remove every message
+        self.client.check_result(folders_response)
+        folders_result = folders_response["result"]
+        folders = {folder["id"]: folder.get("name") for folder in folders_result.get("folders") or []}
+        listed = await self.list_messages(folders)
+
+        indexed = {}
+        for folder_id, id, flags in self.db.execute("SELECT folder_id, id, flags FROM messages"):
+            indexed[(folder_id, id)] = flags
+
+        new, changed, seen = [], [], set()
+        for folder_id, messages in listed.items():
+            for msg in messages:
+                key = (folder_id, int(msg["id"]))
+                flags = json.dumps(sorted(msg.get("flags") or []))
+                seen.add(key)
+                if key not in indexed:
+                    new.append((key, flags))
+                elif indexed[key] != flags:
+                    changed.append((key, flags))
+        #* folders that couldn't be listed keep their messages, messages of deleted folders are removed
+        removed = [key for key in indexed if key not in seen and (key[0] in listed or key[0] not in folders)]
+
+        read, errors = await self.read_messages([key for key, _ in new])
+
+        with self.db:
+            self.db.execute("DELETE FROM folders")
+            self.db.executemany("INSERT INTO folders VALUES (?, ?)", folders.items())
+            self.db.executemany(
+                "INSERT INTO messages VALUES (?, ?, ?, ?)",
+                [(*key, flags, json.dumps(read[key]) if self.store_messages else None) for key, flags in new if key in read],
+            )
+            self.db.executemany("UPDATE messages SET flags = ? WHERE folder_id = ? AND id = ?", [(flags, *key) for key, flags in changed])
+            self.db.executemany("DELETE FROM messages WHERE folder_id = ? AND id = ?", removed)
+
+        return {
+            "new": read,
+            "changed": [key for key, _ in changed],
+            "removed": removed,
+            "errors": errors,
+        }
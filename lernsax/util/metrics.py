@@ -0,0 +1,173 @@
+"""
+Request metrics with Prometheus text export
+"""
+
+import asyncio
+from bisect import bisect_left
+from typing import Dict, List, Tuple
+from aiohttp import TraceConfig
+
+DEFAULT_BUCKETS: Tuple[float, ...] = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+SIZE_BUCKETS: Tuple[float, ...] = (1, 2, 3, 5, 10, 25, 50, 100, 250)
+
+HELPER_METHODS = frozenset({"set_session", "set_focus"})
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+class Histogram:
+    """ Counts observations per bucket upper bound, the last bucket is +Inf """
+
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> None:
+        self.buckets: Tuple[float, ...] = buckets
+        self.counts: List[int] = [0] * (len(buckets) + 1)
+        self.sum: float = 0.0
+        self.count: int = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+def _format_labels(labels: Labels, extra: str = "") -> str:
+    parts = [f'{key}="{value}"' for key, value in labels]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def request_label(data: list) -> str:
+    """ Returns the called method of a jsonrpc request, "batch" if it calls several methods """
+    methods = {call["method"] for call in data} - HELPER_METHODS
+    return methods.pop() if len(methods) == 1 else "batch"
+
+
+class Metrics:
+    """Collects latency histograms, byte and error counters of requests.
+    Pass it to Client (or ClientPool) to record per method latency, batch sizes and errors by errno,
+    and, through trace_config, DNS, connect (TCP and TLS) and time to first byte of every request.
+    Clients without Metrics don't record anything.
+    """
+
+    def __init__(self, prefix: str = "lernsax") -> None:
+        self.prefix: str = prefix
+        self.histograms: Dict[str, Dict[Labels, Histogram]] = {}
+        self.counters: Dict[str, Dict[Labels, float]] = {}
+        self.buckets: Dict[str, Tuple[float, ...]] = {}
+
+    def observe(self, name: str, value: float, buckets: Tuple[float, ...] = DEFAULT_BUCKETS, **labels: str) -> None:
+        series = self.histograms.setdefault(name, {})
+        self.buckets.setdefault(name, buckets)
+        key = tuple(sorted(labels.items()))
+        histogram = series.get(key)
+        if histogram is None:
+            histogram = series[key] = Histogram(self.buckets[name])
+        histogram.observe(value)
+
+    def inc(self, name: str, amount: float = 1, **labels: str) -> None:
+        series = self.counters.setdefault(name, {})
+        key = tuple(sorted(labels.items()))
+        series[key] = series.get(key, 0) + amount
+
+    def record_request(self, data: list, results: list, seconds: float) -> None:
+        """ Records latency, batch size and errors of a jsonrpc request """
+        method = request_label(data)
+        self.observe("request_seconds", seconds, method=method)
+        self.observe("batch_size", len(data), SIZE_BUCKETS)
+        for res in results:
+            errno = res.get("result", {}).get("errno") if isinstance(res, dict) else None
+            if errno:
+                self.inc("errors_total", errno=errno)
+
+    def record_failure(self, data: list, error: Exception) -> None:
+        self.inc("request_failures_total", method=request_label(data), error=type(error).__name__)
+
+    def merge(self, other: "Metrics") -> "Metrics":
+        """ Adds the observations and counts of other (e.g. of another process) to these metrics """
+        for name, series in other.histograms.items():
+            self.buckets.setdefault(name, other.buckets[name])
+            own = self.histograms.setdefault(name, {})
+            for labels, histogram in series.items():
+                target = own.get(labels)
+                if target is None:
+                    target = own[labels] = Histogram(histogram.buckets)
+                target.counts = [a + b for a, b in zip(target.counts, histogram.counts)]
+                target.sum += histogram.sum
+                target.count += histogram.count
+        for name, series in other.counters.items():
+            own = self.counters.setdefault(name, {})
+            for labels, value in series.items():
+                own[labels] = own.get(labels, 0) + value
+        return self
+
+    def trace_config(self) -> TraceConfig:
+        """ Returns an aiohttp TraceConfig recording DNS, connect and TTFB timings and transferred bytes """
+        trace = TraceConfig()
+
+        async def request_start(session, context, params):
+            context.start = asyncio.get_running_loop().time()
+            context.sent = context.start
+
+        async def headers_sent(session, context, params):
+            context.sent = asyncio.get_running_loop().time()
+
+        async def request_end(session, context, params):
+            self.observe("ttfb_seconds", asyncio.get_running_loop().time() - context.sent, host=params.url.host)
+
+        async def request_exception(session, context, params):
+            self.inc("http_errors_total", host=params.url.host, error=type(params.exception).__name__)
+
+        async def dns_start(session, context, params):
+            context.dns_start = asyncio.get_running_loop().time()
+
+        async def dns_end(session, context, params):
+            self.observe("dns_seconds", asyncio.get_running_loop().time() - context.dns_start, host=params.host)
+
+        async def connect_start(session, context, params):
+            context.connect_start = asyncio.get_running_loop().time()
+
+        async def connect_end(session, context, params):
+            self.observe("connect_seconds", asyncio.get_running_loop().time() - context.connect_start)
+
+        async def chunk_sent(session, context, params):
+            self.inc("request_bytes_total", len(params.chunk))
+
+        async def chunk_received(session, context, params):
+            self.inc("response_bytes_total", len(params.chunk))
+
+        trace.on_request_start.append(request_start)
+        if hasattr(trace, "on_request_headers_sent"):
+            trace.on_request_headers_sent.append(headers_sent)
+        trace.on_request_end.append(request_end)
+        trace.on_request_exception.append(request_exception)
+        trace.on_dns_resolvehost_start.append(dns_start)
+        trace.on_dns_resolvehost_end.append(dns_end)
+        trace.on_connection_create_start.append(connect_start)
+        trace.on_connection_create_end.append(connect_end)
+        trace.on_request_chunk_sent.append(chunk_sent)
+        trace.on_response_chunk_received.append(chunk_received)
+        return trace
+
+    def prometheus(self) -> str:
+        """ Returns all metrics in the Prometheus text exposition format """
+        lines = []
+        for name, series in self.histograms.items():
+            full = f"{self.prefix}_{name}"
+            lines.append(f"# TYPE {full} histogram")
+            for labels, histogram in series.items():
+                cumulative = 0
+                for bound, amount in zip((*histogram.buckets, "+Inf"), histogram.counts):
+                    cumulative += amount
+                    bucket = _format_labels(labels, 'le="%s"' % bound)
+                    lines.append(f"{full}_bucket{bucket} {cumulative}")
+                lines.append(f"{full}_sum{_format_labels(labels)} {histogram.sum}")
+                lines.append(f"{full}_count{_format_labels(labels)} {histogram.count}")
+        for name, series in self.counters.items():
+            full = f"{self.prefix}_{name}"
+            lines.append(f"# TYPE {full} counter")
+            for labels, value in series.items():
+                lines.append(f"{full}{_format_labels(labels)} {value}")
+        return "\n".join(lines) + "\n"
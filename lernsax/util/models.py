@@ -0,0 +1,119 @@
+"""
+Compact typed models for list results
+"""
+
+from abc import ABC, abstractmethod
+from typing import Any, Dict, Optional, Tuple
+
+
+def _int(value: Any) -> Optional[int]:
+    """ LernSax sends most numbers as strings """
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class Model(ABC):
+    """Base class for models, every field is a slot so instances don't carry a dict.
+    key is the key of the list holding the entries in the method result.
+    Models compare and hash by their fields, list fields are stored as tuples.
+    """
+
+    __slots__: Tuple[str, ...] = ()
+    key: str = "entries"
+
+    def __init__(self, **fields: Any) -> None:
+        for name in self.__slots__:
+            setattr(self, name, fields.get(name))
+
+    @classmethod
+    @abstractmethod
+    def from_dict(cls, data: dict) -> "Model":
+        """ Builds the model from an entry of the method result """
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __eq__(self, other: Any) -> bool:
+        return type(self) is type(other) and all(getattr(self, name) == getattr(other, name) for name in self.__slots__)
+
+    def __hash__(self) -> int:
+        return hash((type(self), *(getattr(self, name) for name in self.__slots__)))
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({', '.join(f'{name}={getattr(self, name)!r}' for name in self.__slots__)})"
+
+
+class Task(Model):
+    """ Entry of get_tasks """
+
+    __slots__ = ("id", "title", "description", "start_date", "due_date", "completed")
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Task":
+        return cls(
+            id=data.get("id"),
+            title=data.get("title"),
+            description=data.get("description"),
+            start_date=_int(data.get("start_date")),
+            due_date=_int(data.get("due_date")),
+            completed=bool(_int(data.get("completed"))),
+        )
+
+
+class Entry(Model):
+    """ Entry of get_board and get_notes """
+
+    __slots__ = ("id", "title", "text", "color", "date")
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Entry":
+        return cls(
+            id=data.get("id"),
+            title=data.get("title"),
+            text=data.get("text"),
+            color=data.get("color"),
+            date=_int((data.get("created") or {}).get("date", data.get("date"))),
+        )
+
+
+class MailHeader(Model):
+    """ Message of get_emails """
+
+    __slots__ = ("id", "subject", "date", "size", "flags", "sender", "sender_name")
+    key = "messages"
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "MailHeader":
+        sender = (data.get("from") or [{}])[0]
+        return cls(
+            id=_int(data.get("id")),
+            subject=data.get("subject"),
+            date=_int(data.get("date")),
+            size=_int(data.get("size")),
+            flags=tuple(data.get("flags") or ()),
+            sender=sender.get("addr"),
+            sender_name=sender.get("name"),
+        )
+
+
+class QuickMessage(Model):
+    """ Message of read_quickmessages and get_quickmessage_history """
+
+    __slots__ = ("id", "text", "date", "flags", "sender", "chat", "chat_name", "chat_type")
+    key = "messages"
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "QuickMessage":
+        to = data.get("to") or {}
+        return cls(
+            id=_int(data.get("id")),
+            text=data.get("text"),
+            date=_int(data.get("date")),
+            flags=tuple(data.get("flags") or ()),
+            sender=(data.get("from") or {}).get("login"),
+            chat=to.get("login"),
+            chat_name=to.get("name_hr"),
+            chat_type=to.get("type"),
+        )
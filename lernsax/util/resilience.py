@@ -0,0 +1,134 @@
+"""
+Retries with backoff and circuit breaking for requests to LernSax
+"""
+
+import asyncio
+import random
+from time import monotonic
+from typing import Awaitable, Callable, Dict, Optional, TypeVar
+from aiohttp import ClientConnectionError, ClientResponseError
+from . import exceptions
+
+T = TypeVar("T")
+
+#* methods that can be sent again without side effects
+READ_METHODS = frozenset({
+    "set_session", "set_focus", "get_information", "get_entries", "get_file_download_url",
+    "get_messages", "read_message", "get_folders", "read_quick_messages", "get_history", "get_users",
+})
+
+def is_idempotent(data: list) -> bool:
+    """ Returns whether every call of a jsonrpc request is read only """
+    return all(call["method"] in READ_METHODS for call in data)
+
+
+def is_retryable(error: Exception) -> bool:
+    """ Connection errors, timeouts and 5xx responses are worth another try """
+    if isinstance(error, ClientResponseError):
+        return error.status >= 500
+    return isinstance(error, (ClientConnectionError, asyncio.TimeoutError))
+
+
+class CircuitBreaker:
+    """Stops requests to a host after `threshold` failures in a row.
+    After reset_timeout seconds a single trial request is let through, its success closes the circuit again.
+    """
+
+    def __init__(self, threshold: int = 5, reset_timeout: float = 30) -> None:
+        self.threshold: int = threshold
+        self.reset_timeout: float = reset_timeout
+        self.failures: int = 0
+        self.opened: Optional[float] = None
+        self.trial: bool = False
+
+    @property
+    def state(self) -> str:
+        if self.opened is None:
+            return "closed"
+        return "half_open" if monotonic() - self.opened >= self.reset_timeout else "open"
+
+    def before(self) -> None:
+        """ Raises CircuitOpen if no request may be sent right now """
+        state = self.state
+        if state == "open" or (state == "half_open" and self.trial):
+            raise exceptions.CircuitOpen(f"circuit open after {self.failures} failures")
+        if state == "half_open":
+            self.trial = True
+
+    def release(self) -> None:
+        """ Lets the next trial request through, for a trial that was cancelled before it succeeded or failed """
+        self.trial = False
+
+    def success(self) -> None:
+        self.failures, self.opened, self.trial = 0, None, False
+
+    def failure(self) -> None:
+        self.failures += 1
+        self.trial = False
+        if self.failures >= self.threshold:
+            self.opened = monotonic()
+
+
+class RetryPolicy:
+    """Retries read only requests on connection errors, timeouts and 5xx responses
+    with exponential backoff and full jitter. Every request gets a timeout of `timeout` seconds.
+    With relogin set, calls failing with an expired session (errno 106) log in again and are replayed once.
+    """
+
+    def __init__(
+        self,
+        attempts: int = 3,
+        base_delay: float = 0.2,
+        max_delay: float = 5,
+        timeout: float = 30,
+        relogin: bool = True,
+        breaker_threshold: int = 5,
+        breaker_timeout: float = 30,
+    ) -> None:
+        self.attempts: int = attempts
+        self.base_delay: float = base_delay
+        self.max_delay: float = max_delay
+        self.timeout: float = timeout
+        self.relogin: bool = relogin
+        self.breaker_threshold: int = breaker_threshold
+        self.breaker_timeout: float = breaker_timeout
+        #* one breaker per host, shared by the clients using this policy
+        self.breakers: Dict[str, CircuitBreaker] = {}
+
+    def delay(self, attempt: int) -> float:
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def breaker(self, host: str) -> CircuitBreaker:
+        """ Returns the circuit breaker of host """
+        if host not in self.breakers:
+            self.breakers[host] = CircuitBreaker(self.breaker_threshold, self.breaker_timeout)
+        return self.breakers[host]
+
+    async def run(self, func: Callable[[], Awaitable[T]], idempotent: bool, breaker: CircuitBreaker = None) -> T:
+        """ Runs func, retrying it if idempotent is set """
+        attempt = 0
+        while True:
+            if breaker is not None:
+                breaker.before()
+            try:
+                result = await func()
+            except Exception as e:
+                if not is_retryable(e):
+                    if breaker is not None:
+                        breaker.success()
+                    raise
+                if breaker is not None:
+                    breaker.failure()
+                attempt += 1
+                if not idempotent or attempt >= self.attempts:
+                    raise
+                await asyncio.sleep(self.delay(attempt))
+            except BaseException:
+                #* cancelled requests neither close nor open the circuit
+                if breaker is not None:
+                    breaker.release()
+                raise
+            else:
+                if breaker is not None:
+                    breaker.success()
+                return result
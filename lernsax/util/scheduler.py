@@ -0,0 +1,141 @@
+"""
+Central session refresh for many clients
+"""
+
+import asyncio
+import heapq
+import random
+from itertools import count
+from logging import getLogger
+from typing import Dict, List, Tuple
+from weakref import WeakKeyDictionary
+
+logger = getLogger(__name__)
+
+_DEFAULT: "WeakKeyDictionary[asyncio.AbstractEventLoop, SessionScheduler]" = WeakKeyDictionary()
+
+
+class SessionScheduler:
+    """Refreshes the sessions of all registered clients from a single task.
+    Refreshes are spread over the interval, clients with traffic inside the interval are skipped
+    and clients sharing a ClientPool are refreshed together with one set_session call per account.
+    Cancelling the task (e.g. on event loop shutdown) closes all registered clients.
+    """
+
+    def __init__(self, interval: float = 60 * 5, batch_size: int = 50) -> None:
+        self.interval: float = interval
+        self.batch_size: int = batch_size
+        self.heap: List[Tuple[float, int, object]] = []
+        self.clients: Dict[int, object] = {}
+        self.counter = count()
+        self.task: asyncio.Task = None
+        self.wakeup: asyncio.Event = None
+
+    @classmethod
+    def default(cls) -> "SessionScheduler":
+        """ Returns the scheduler shared by all clients of the running event loop """
+        loop = asyncio.get_running_loop()
+        if loop not in _DEFAULT:
+            _DEFAULT[loop] = cls()
+        return _DEFAULT[loop]
+
+    def register(self, client) -> None:
+        """ Starts refreshing the session of client, the first refresh is at a random point of the interval """
+        loop = asyncio.get_running_loop()
+        self.clients[id(client)] = client
+        self.schedule(client, loop.time() + random.uniform(0, self.interval))
+        if self.task is None or self.task.done():
+            self.wakeup = asyncio.Event()
+            self.task = loop.create_task(self.run())
+
+    def unregister(self, client) -> None:
+        """ Stops refreshing the session of client """
+        #* heap entries of removed clients are dropped when they are due
+        self.clients.pop(id(client), None)
+
+    def schedule(self, client, due: float) -> None:
+        if self.heap and due < self.heap[0][0] and self.wakeup:
+            self.wakeup.set()
+        heapq.heappush(self.heap, (due, next(self.counter), client))
+
+    async def run(self) -> None:
+        loop = asyncio.get_running_loop()
+        try:
+            while self.clients:
+                if self.heap:
+                    delay = self.heap[0][0] - loop.time()
+                else:
+                    delay = self.interval
+                if delay > 0:
+                    self.wakeup.clear()
+                    try:
+                        await asyncio.wait_for(self.wakeup.wait(), delay)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+
+                now, due = loop.time(), []
+                while self.heap and self.heap[0][0] <= now:
+                    _, _, client = heapq.heappop(self.heap)
+                    if self.clients.get(id(client)) is not client:
+                        continue
+                    last = getattr(client, "last_activity", 0)
+                    if last > now - self.interval:
+                        #* recent traffic already refreshed the session
+                        self.schedule(client, last + self.interval)
+                    elif not client.sid:
+                        self.schedule(client, now + self.interval)
+                    else:
+                        due.append(client)
+                if due:
+                    await self.refresh(due)
+                    for client in due:
+                        if self.clients.get(id(client)) is client:
+                            self.schedule(client, loop.time() + self.interval)
+        finally:
+            clients, self.clients, self.heap = list(self.clients.values()), {}, []
+            await asyncio.gather(*(client.close() for client in clients), return_exceptions=True)
+
+    async def refresh(self, clients: list) -> None:
+        """ Refreshes the sessions of clients, batching clients of the same pool """
+        groups: Dict[int, list] = {}
+        for client in clients:
+            pool = getattr(client, "pool", None)
+            groups.setdefault(id(pool) if pool is not None else id(client), []).append(client)
+
+        jobs = []
+        for group in groups.values():
+            if len(group) == 1:
+                jobs.append(self.refresh_single(group[0]))
+            else:
+                for i in range(0, len(group), self.batch_size):
+                    jobs.append(self.refresh_batch(group[i:i + self.batch_size]))
+        await asyncio.gather(*jobs)
+
+    @staticmethod
+    async def refresh_single(client) -> None:
+        try:
+            await client.refresh_session()
+        except Exception as e:
+            logger.warning(f"refreshing session of {client.email} failed: {e!r}")
+
+    @staticmethod
+    async def refresh_batch(clients: list) -> None:
+        data = clients[0].jsonrpc(
+            [[i, "set_session", {"session_id": client.sid}] for i, client in enumerate(clients, 1)])
+        try:
+            results_raw = await clients[0].post(data)
+        except Exception as e:
+            logger.warning(f"refreshing {len(clients)} sessions failed: {e!r}")
+            return
+        by_id = {res.get("id"): res for res in results_raw}
+        for i, client in enumerate(clients, 1):
+            res = by_id.get(i)
+            if res is None or res["result"]["return"] != "OK":
+                logger.warning(f"refreshing session of {client.email} failed: {res}")
+
+    async def close(self) -> None:
+        """ Stops the task and closes all registered clients """
+        if self.task is not None and not self.task.done():
+            self.task.cancel()
+            await asyncio.gather(self.task, return_exceptions=True)
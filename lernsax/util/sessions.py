@@ -0,0 +1,111 @@
+"""
+Persistent sessions to skip the login on restart
+"""
+
+import asyncio
+import json
+import os
+import sqlite3
+from typing import Dict, List, Optional, Tuple
+
+#* (session id, member_of)
+StoredSession = Tuple[str, List[str]]
+
+
+class FileSessionStore:
+    """ JSON file backend readable only by its owner, rewritten on every change, prefer SqliteSessionStore for many accounts """
+
+    def __init__(self, path: str) -> None:
+        self.path: str = path
+        self.sessions: Dict[str, dict] = {}
+        if os.path.exists(path):
+            with open(path, "r") as file:
+                self.sessions = json.load(file)
+
+    def get(self, email: str) -> Optional[StoredSession]:
+        session = self.sessions.get(email)
+        return (session["sid"], session["member_of"]) if session else None
+
+    def set(self, email: str, sid: str, member_of: List[str]) -> None:
+        self.sessions[email] = {"sid": sid, "member_of": list(member_of)}
+        self.write()
+
+    def delete(self, email: str) -> None:
+        if self.sessions.pop(email, None) is not None:
+            self.write()
+
+    def write(self) -> None:
+        #* session ids are credentials, write them atomically and private
+        tmp = self.path + ".tmp"
+        with os.fdopen(os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), "w") as file:
+            json.dump(self.sessions, file)
+        os.replace(tmp, self.path)
+
+
+class SqliteSessionStore:
+    """ SQLite backend, a new database file is only readable by its owner """
+
+    def __init__(self, path: str) -> None:
+        if path != ":memory:" and not path.startswith("file:") and not os.path.exists(path):
+            #* session ids are credentials, create the database private before sqlite writes to it
+            os.close(os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600))
+        self.db: sqlite3.Connection = sqlite3.connect(path)
+        self.db.execute("CREATE TABLE IF NOT EXISTS sessions (email TEXT PRIMARY KEY, sid TEXT, member_of TEXT)")
+
+    def get(self, email: str) -> Optional[StoredSession]:
+        row = self.db.execute("SELECT sid, member_of FROM sessions WHERE email = ?", (email,)).fetchone()
+        return (row[0], json.loads(row[1])) if row else None
+
+    def set(self, email: str, sid: str, member_of: List[str]) -> None:
+        with self.db:
+            self.db.execute("INSERT OR REPLACE INTO sessions VALUES (?, ?, ?)", (email, sid, json.dumps(list(member_of))))
+
+    def delete(self, email: str) -> None:
+        with self.db:
+            self.db.execute("DELETE FROM sessions WHERE email = ?", (email,))
+
+
+async def validate_sessions(clients: list, sessions: List[StoredSession]) -> List[bool]:
+    """ Checks the stored sessions of clients with one set_session call per account in a single request """
+    data = clients[0].jsonrpc(
+        [[i, "set_session", {"session_id": sid}] for i, (sid, _) in enumerate(sessions, 1)])
+    results_raw = await clients[0].post(data)
+    by_id = {res.get("id"): res for res in results_raw}
+    return [
+        by_id.get(i) is not None and by_id[i]["result"]["return"] == "OK" for i in range(1, len(sessions) + 1)
+    ]
+
+
+async def restore_sessions(clients: list, batch_size: int = 50, stagger: float = 0) -> list:
+    """Restores the stored sessions of clients, validating up to batch_size of them per request.
+    Clients without a valid stored session log in, spread evenly over stagger seconds.
+    Returns True for every restored client and the login result or exception for the others.
+    """
+    results: list = [None] * len(clients)
+    stored = [(i, client, client.session_store.get(client.email)) for i, client in enumerate(clients)
+              if client.session_store is not None]
+    stored = [(i, client, session) for i, client, session in stored if session is not None]
+    chunks = [stored[start:start + batch_size] for start in range(0, len(stored), batch_size)]
+    validated = await asyncio.gather(
+        *(validate_sessions([client for _, client, _ in chunk], [session for *_, session in chunk]) for chunk in chunks),
+        return_exceptions=True)
+    for chunk, valid in zip(chunks, validated):
+        if isinstance(valid, BaseException):
+            continue
+        for (i, client, (sid, member_of)), ok in zip(chunk, valid):
+            if ok:
+                client.sid, client.member_of = sid, list(member_of)
+                results[i] = True
+
+    expired = [i for i, result in enumerate(results) if result is None]
+
+    async def login(position: int, i: int) -> None:
+        if stagger:
+            await asyncio.sleep(position * stagger / len(expired))
+        try:
+            results[i] = await clients[i].login()
+        except Exception as e:
+            results[i] = e
+
+    await asyncio.gather(*(login(position, i) for position, i in enumerate(expired)))
+    return results
@@ -0,0 +1,80 @@
+"""
+Lazy attribute access to decoded responses
+"""
+
+from typing import Any, Iterator, Mapping, Sequence
+
+
+def wrap(value: Any) -> Any:
+    """ Wraps dicts and lists in views, other values are returned as they are """
+    if isinstance(value, dict):
+        return AttrView(value)
+    if isinstance(value, list):
+        return ListView(value)
+    return value
+
+
+class AttrView(Mapping):
+    """Read only view of a dict that allows attribute access like Box.
+    Nothing is copied, nested dicts and lists are wrapped when they are accessed.
+    """
+
+    __slots__ = ("_data",)
+
+    def __init__(self, data: dict) -> None:
+        self._data = data
+
+    def __getattr__(self, key: str) -> Any:
+        #* copy and pickle look up dunders before _data is set
+        if key.startswith("__") or key == "_data":
+            raise AttributeError(key)
+        try:
+            return wrap(self._data[key])
+        except KeyError:
+            raise AttributeError(key) from None
+
+    def __getitem__(self, key: str) -> Any:
+        return wrap(self._data[key])
+
+    def __iter__(self) -> Iterator:
+        return iter(self._data)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __repr__(self) -> str:
+        return f"AttrView({self._data!r})"
+
+    def __reduce__(self) -> tuple:
+        return (AttrView, (self._data,))
+
+    def to_dict(self) -> dict:
+        """ Returns the underlying dict """
+        return self._data
+
+
+class ListView(Sequence):
+    """ Read only view of a list, items are wrapped when they are accessed """
+
+    __slots__ = ("_data",)
+
+    def __init__(self, data: list) -> None:
+        self._data = data
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return ListView(self._data[index])
+        return wrap(self._data[index])
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __repr__(self) -> str:
+        return f"ListView({self._data!r})"
+
+    def __reduce__(self) -> tuple:
+        return (ListView, (self._data,))
+
+    def to_list(self) -> list:
+        """ Returns the underlying list """
+        return self._data
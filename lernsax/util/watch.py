@@ -0,0 +1,161 @@
+"""
+Change feed over polled tasks, board entries, notes and quickmessages
+"""
+
+import asyncio
+import heapq
+import json
+from collections import deque
+from itertools import count
+from logging import getLogger
+from typing import Deque, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+logger = getLogger(__name__)
+
+#* source: (Batch method, key of the list in the result, polled per login)
+SOURCES = {
+    "tasks": ("get_tasks", "entries", True),
+    "board": ("get_board", "entries", True),
+    "notes": ("get_notes", "entries", True),
+    "quickmessages": ("read_quickmessages", "messages", False),
+}
+
+Focus = Tuple[str, Optional[str]]
+
+
+class WatchEvent(NamedTuple):
+    """ kind is "added", "changed" or "removed", entry is None for removed entries """
+
+    kind: str
+    source: str
+    login: Optional[str]
+    id: str
+    entry: Optional[dict]
+
+
+def fingerprint(entry: dict) -> Tuple[str, int]:
+    """ Returns the id and hash of entry, entries without an id are identified by their hash """
+    digest = hash(json.dumps(entry, sort_keys=True, separators=(",", ":")))
+    return str(entry.get("id", digest)), digest
+
+
+class Watcher:
+    """Async iterator yielding a WatchEvent for every added, changed or removed entry of the watched sources.
+    Every focus (source and group login) is polled on its own interval: it is reset to min_interval
+    when the focus changed and multiplied by backoff up to max_interval while it stays idle.
+    All foci that are due are polled together in batched requests of up to max_calls calls.
+    Only a fingerprint (id to hash) of every focus is kept, the first poll of a focus only fills it
+    unless emit_initial is set.
+    """
+
+    def __init__(
+        self,
+        client,
+        sources: Iterable[str] = ("tasks", "board", "quickmessages"),
+        logins: Iterable[str] = None,
+        min_interval: float = 30,
+        max_interval: float = 600,
+        backoff: float = 2,
+        max_calls: int = 50,
+        emit_initial: bool = False,
+    ) -> None:
+        self.client = client
+        self.sources: List[str] = list(sources)
+        for source in self.sources:
+            if source not in SOURCES:
+                raise ValueError(f"unknown source {source!r}, expected one of {', '.join(SOURCES)}")
+        #* defaults to the groups of the client when polling starts
+        self.logins: Optional[List[str]] = list(logins) if logins is not None else None
+        self.min_interval: float = min_interval
+        self.max_interval: float = max_interval
+        self.backoff: float = backoff
+        self.max_calls: int = max_calls
+        self.emit_initial: bool = emit_initial
+        self.index: Dict[Focus, Dict[str, int]] = {}
+        self.intervals: Dict[Focus, float] = {}
+        self.heap: List[Tuple[float, int, Focus]] = []
+        self.counter = count()
+        self.events: Deque[WatchEvent] = deque()
+        self.started: bool = False
+        self.closed: bool = False
+
+    def __aiter__(self) -> "Watcher":
+        return self
+
+    async def __anext__(self) -> WatchEvent:
+        if not self.started:
+            self.start()
+        while not self.events:
+            if self.closed or not self.heap:
+                raise StopAsyncIteration
+            await self.poll()
+        return self.events.popleft()
+
+    def start(self) -> None:
+        """ Schedules all foci for an immediate first poll """
+        self.started = True
+        logins = self.logins if self.logins is not None else list(self.client.member_of)
+        now = asyncio.get_running_loop().time()
+        for source in self.sources:
+            for login in (logins if SOURCES[source][2] else [None]):
+                self.intervals[(source, login)] = self.min_interval
+                heapq.heappush(self.heap, (now, next(self.counter), (source, login)))
+
+    async def poll(self) -> None:
+        """ Waits for the next due foci and polls all due foci in one batch """
+        loop = asyncio.get_running_loop()
+        await asyncio.sleep(max(0.0, self.heap[0][0] - loop.time()))
+        due = []
+        #* foci that are almost due are polled early to share the request
+        now = loop.time() + self.min_interval / 4
+        while self.heap and self.heap[0][0] <= now:
+            due.append(heapq.heappop(self.heap)[2])
+        batch = self.client.batch(self.max_calls)
+        futures = {}
+        for source, login in due:
+            method = getattr(batch, SOURCES[source][0])
+            futures[(source, login)] = method(login) if login is not None else method()
+        try:
+            await batch.send()
+        except Exception as e:
+            logger.warning(f"polling {len(due)} foci failed: {e!r}")
+        now = loop.time()
+        for focus, future in futures.items():
+            changed = self.update(focus, future)
+            interval = self.min_interval if changed else min(self.max_interval, self.intervals[focus] * self.backoff)
+            self.intervals[focus] = interval
+            heapq.heappush(self.heap, (now + interval, next(self.counter), focus))
+
+    def update(self, focus: Focus, future: asyncio.Future) -> bool:
+        """ Diffs the polled entries of focus against its fingerprint, queues the events and returns whether it changed """
+        if not future.done() or future.cancelled() or future.exception() is not None:
+            return False
+        result = future.result()["result"]["result"]
+        if result.get("return") != "OK":
+            logger.debug(f"polling {focus} returned {result.get('errno')}")
+            return False
+        source, login = focus
+        new, entries = {}, {}
+        for entry in result.get(SOURCES[source][1]) or []:
+            id, digest = fingerprint(entry)
+            new[id], entries[id] = digest, entry
+        old = self.index.get(focus)
+        self.index[focus] = new
+        if old is None and not self.emit_initial:
+            return False
+        old = old or {}
+        before = len(self.events)
+        for id, digest in new.items():
+            if id not in old:
+                self.events.append(WatchEvent("added", source, login, id, entries[id]))
+            elif old[id] != digest:
+                self.events.append(WatchEvent("changed", source, login, id, entries[id]))
+        for id in old.keys() - new.keys():
+            self.events.append(WatchEvent("removed", source, login, id, None))
+        return len(self.events) > before
+
+    async def aclose(self) -> None:
+        """ Stops watching """
+        self.closed = True
+        self.events.clear()
+        self.heap.clear()
@@ -0,0 +1,54 @@
+import asyncio
+from fake_server import FakeLernSax
+from lernsax import Client
+from lernsax.util import MailboxSync, RetryPolicy
+
+
+def test_calls_of_a_focus_refer_to_its_set_focus():
+    async def main():
+        async with FakeLernSax(mails=5) as server:
+            client = Client("me@example.org", "pw", api_uri=server.api_uri, webdav=False)
+            await client.login()
+            async with client.batch() as batch:
+                futures = [batch.read_email("INBOX", id) for id in (1, 99, 2)]
+            await asyncio.gather(*futures, return_exceptions=True)
+            assert futures[1].exception() is not None
+            for future in (futures[0], futures[2]):
+                assert future.result()["helpers"][1]["result"] == {"return": "OK"}
+                assert future.result()["result"]["result"]["return"] == "OK"
+
+            sync = MailboxSync(client)
+            read, errors = await sync.read_messages([("INBOX", 1), ("INBOX", 99), ("INBOX", 2)])
+            assert sorted(read) == [("INBOX", 1), ("INBOX", 2)] and list(errors) == [("INBOX", 99)]
+            sync.close()
+            await client.close()
+
+    asyncio.run(main())
+
+
+def test_failing_target_between_good_ones_only_fails_itself():
+    async def main():
+        async with FakeLernSax() as server:
+            client = Client("me@example.org", "pw", api_uri=server.api_uri, webdav=False)
+            await client.login()
+            report = await client.send_quickmessages(["u1@example.org", "unknown1@example.org", "u2@example.org"], "hi")
+            assert isinstance(report["unknown1@example.org"], Exception)
+            for login in ("u1@example.org", "u2@example.org"):
+                assert report[login]["result"]["result"]["return"] == "OK"
+            await client.close()
+
+    asyncio.run(main())
+
+
+def test_batches_log_in_again_after_the_session_expired():
+    async def main():
+        async with FakeLernSax() as server:
+            client = Client("me@example.org", "pw", api_uri=server.api_uri, webdav=False, retry=RetryPolicy())
+            await client.login()
+            server.expire_sessions()
+            report = await client.send_quickmessages(["u1@example.org", "u2@example.org"], "hi")
+            assert all(result["result"]["result"]["return"] == "OK" for result in report.values())
+            assert client.sid in server.sessions
+            await client.close()
+
+    asyncio.run(main())
@@ -0,0 +1,50 @@
+import asyncio
+from fake_server import FakeLernSax
+from lernsax import Client
+from lernsax.util import ResponseCache
+
+
+def test_board_entry_invalidates_cached_board():
+    async def main():
+        async with FakeLernSax() as server:
+            client = Client("me@example.org", "pw", api_uri=server.api_uri, webdav=False)
+            client.cache = ResponseCache()
+            await client.login()
+            group = client.member_of[0]
+            await client.get_board(group)
+            requests = server.requests
+            await client.get_board(group)
+            assert server.requests == requests
+
+            await client.add_board_entry(group, "title", "text", "#ff0000")
+            requests = server.requests
+            await client.get_board(group)
+            assert server.requests == requests + 1
+
+            async with client.batch() as batch:
+                batch.add_board_entry(group, "title", "text", "#ff0000")
+            requests = server.requests
+            await client.get_board(group)
+            assert server.requests == requests + 1
+            await client.close()
+
+    asyncio.run(main())
+
+
+def test_cancelled_caller_does_not_cancel_shared_request():
+    async def main():
+        async with FakeLernSax(latency=0.1) as server:
+            client = Client("me@example.org", "pw", api_uri=server.api_uri, webdav=False)
+            client.cache = ResponseCache()
+            await client.login()
+            group = client.member_of[0]
+            first = asyncio.ensure_future(client.get_board(group))
+            second = asyncio.ensure_future(client.get_board(group))
+            await asyncio.sleep(0.02)
+            first.cancel()
+            result = await second
+            assert result["result"]["result"]["return"] == "OK"
+            assert first.cancelled()
+            await client.close()
+
+    asyncio.run(main())
@@ -0,0 +1,15 @@
+import asyncio
+from fake_server import FakeLernSax
+from lernsax import Client
+
+
+def test_client_is_an_async_context_manager():
+    async def main():
+        async with FakeLernSax() as server:
+            async with Client("me@example.org", "pw", api_uri=server.api_uri, webdav=False) as client:
+                await client.login()
+                assert client.sid in server.sessions
+            assert client.http.closed
+            assert client.sid not in server.sessions
+
+    asyncio.run(main())
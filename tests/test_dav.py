@@ -0,0 +1,89 @@
+import asyncio
+import json
+import pytest
+from aiohttp import ClientResponseError, ClientSession, web
+from fake_server import FakeLernSax
+from lernsax.util import TransferEngine
+
+
+def test_mirror_keeps_files_below_listed_levels(tmp_path):
+    async def main():
+        async with FakeLernSax(files=0) as server, ClientSession() as session:
+            server.files = {"files/top.bin": b"top", "files/sub/deep.bin": b"deep"}
+            server.dirs = {"files", "files/sub"}
+            engine = TransferEngine(session, server.dav_uri)
+            await engine.mirror("/files", str(tmp_path))
+            assert (tmp_path / "sub" / "deep.bin").read_bytes() == b"deep"
+
+            report = await engine.mirror("/files", str(tmp_path), max_levels=1)
+            assert report["deleted"] == []
+            assert (tmp_path / "sub" / "deep.bin").exists()
+
+            del server.files["files/top.bin"]
+            report = await engine.mirror("/files", str(tmp_path), max_levels=1)
+            assert report["deleted"] == ["top.bin"]
+            assert not (tmp_path / "top.bin").exists()
+            assert (tmp_path / "sub" / "deep.bin").exists()
+
+            del server.files["files/sub/deep.bin"]
+            report = await engine.mirror("/files", str(tmp_path))
+            assert report["deleted"] == ["sub/deep.bin"]
+
+    asyncio.run(main())
+
+
+def test_failed_part_cancels_the_other_parts(tmp_path):
+    async def main():
+        server = FakeLernSax(files=1, file_size=4096)
+        webdav = server.webdav
+
+        async def failing_webdav(request):
+            if request.method == "GET":
+                if request.headers.get("Range", "").startswith("bytes=0-"):
+                    raise web.HTTPInternalServerError()
+                await asyncio.sleep(0.5)
+            return await webdav(request)
+
+        server.webdav = failing_webdav
+        async with server, ClientSession() as session:
+            engine = TransferEngine(session, server.dav_uri, part_size=1024)
+            entry = (await engine.list("/files/file0.bin", 0))[0]
+            with pytest.raises(ClientResponseError):
+                await engine.download_parts("/files/file0.bin", str(tmp_path / "file0.bin.part"), entry)
+            assert not [task for task in asyncio.all_tasks() if task.get_coro().__name__ == "part"]
+
+    asyncio.run(main())
+
+
+def test_stream_resumes_only_the_same_version(tmp_path):
+    async def main():
+        server = FakeLernSax(files=1, file_size=1024)
+        webdav = server.webdav
+        sent = []
+
+        async def recording_webdav(request):
+            if request.method == "GET":
+                sent.append(dict(request.headers))
+            return await webdav(request)
+
+        server.webdav = recording_webdav
+        async with server, ClientSession() as session:
+            engine = TransferEngine(session, server.dav_uri)
+            entry = (await engine.list("/files/file0.bin", 0))[0]
+            local = tmp_path / "file0.bin"
+            content = server.files["files/file0.bin"]
+
+            (tmp_path / "file0.bin.part").write_bytes(b"x" * 100)
+            (tmp_path / "file0.bin.part.json").write_text(json.dumps({"stream": '"other"', "size": entry.size}))
+            await engine.download_file("/files/file0.bin", str(local), entry)
+            assert "Range" not in sent[-1]
+            assert local.read_bytes() == content
+
+            (tmp_path / "file0.bin.part").write_bytes(content[:100])
+            (tmp_path / "file0.bin.part.json").write_text(json.dumps({"stream": entry.etag, "size": entry.size}))
+            await engine.download_file("/files/file0.bin", str(local), entry)
+            assert sent[-1]["Range"] == "bytes=100-"
+            assert sent[-1]["If-Range"] == entry.etag
+            assert local.read_bytes() == content
+
+    asyncio.run(main())
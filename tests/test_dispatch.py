@@ -0,0 +1,20 @@
+import asyncio
+import pytest
+from lernsax.util import Dispatcher
+
+
+@pytest.mark.parametrize("requests", [1, 3])
+def test_cancelled_dispatch_cancels_submitters(requests):
+    async def main():
+        async def send(data):
+            await asyncio.sleep(10)
+
+        dispatcher = Dispatcher(send, max_delay=0)
+        submitters = [asyncio.ensure_future(dispatcher.submit([{"id": 1, "method": "m"}])) for _ in range(requests)]
+        await asyncio.sleep(0.01)
+        for task in list(dispatcher.tasks):
+            task.cancel()
+        results = await asyncio.wait_for(asyncio.gather(*submitters, return_exceptions=True), 1)
+        assert all(isinstance(result, asyncio.CancelledError) for result in results)
+
+    asyncio.run(main())
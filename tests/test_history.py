@@ -0,0 +1,42 @@
+import asyncio
+import pytest
+from fake_server import FakeLernSax
+from lernsax import Client
+from lernsax.util.exceptions import InvalidSession
+
+
+def test_failed_page_raises_and_is_fetched_again():
+    async def main():
+        async with FakeLernSax(history=250, page_size=100) as server:
+            client = Client("me@example.org", "pw", api_uri=server.api_uri, webdav=False)
+            await client.login()
+            history = client.iter_quickmessage_history()
+            ids = [(await history.__anext__())["id"] for _ in range(100)]
+            server.expire_sessions()
+            with pytest.raises(InvalidSession):
+                async for msg in history:
+                    ids.append(msg["id"])
+            await client.login()
+            ids += [msg["id"] async for msg in history]
+            assert ids == list(range(1, 251))
+            await client.close()
+
+    asyncio.run(main())
+
+
+def test_cursor_follows_unsorted_pages():
+    async def main():
+        async with FakeLernSax(history=250, page_size=100) as server:
+            get_history = server.rpc_get_history
+            server.rpc_get_history = lambda params, state: {
+                **get_history(params, state), "messages": get_history(params, state)["messages"][::-1]}
+            client = Client("me@example.org", "pw", api_uri=server.api_uri, webdav=False)
+            await client.login()
+            history = client.iter_quickmessage_history()
+            yielded = [(await history.__anext__())["id"] for _ in range(10)]
+            await history.aclose()
+            resumed = [msg["id"] async for msg in client.iter_quickmessage_history(history.cursor)]
+            assert yielded + resumed == list(range(1, 251))
+            await client.close()
+
+    asyncio.run(main())
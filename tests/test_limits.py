@@ -0,0 +1,36 @@
+import asyncio
+import pytest
+from lernsax import Client, ClientPool
+from lernsax.util.limits import PriorityRateLimiter
+
+
+def test_rate_limiter_survives_a_new_event_loop():
+    limiter = PriorityRateLimiter(rate=20, burst=1)
+
+    async def first():
+        await limiter.acquire()
+        #* leaves a waiter and an armed timer behind when the loop closes
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(limiter.acquire(), 0.01)
+
+    async def second():
+        await asyncio.wait_for(asyncio.gather(limiter.acquire(), limiter.acquire()), 1)
+
+    asyncio.run(first())
+    asyncio.run(second())
+
+
+def test_rate_limiter_is_owned_by_client_or_pool():
+    async def main():
+        first = Client("a@example.org", "pw", rate_limit=1, webdav=False)
+        second = Client("b@example.org", "pw", rate_limit=100, webdav=False)
+        assert first.rate_limiter is not second.rate_limiter
+        assert second.rate_limiter.rate == 100
+        async with ClientPool(rate_limit=5) as pool:
+            assert pool.client("c@example.org", "pw").rate_limiter is pool.rate_limiter
+            with pytest.raises(ValueError):
+                Client("d@example.org", "pw", pool=pool, rate_limit=100)
+        await first.close()
+        await second.close()
+
+    asyncio.run(main())
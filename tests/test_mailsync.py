@@ -0,0 +1,24 @@
+import asyncio
+from fake_server import FakeLernSax, ok
+from lernsax import Client
+from lernsax.util import MailboxSync
+
+
+def test_messages_of_deleted_folders_are_removed():
+    async def main():
+        async with FakeLernSax(mails=5) as server:
+            client = Client("me@example.org", "pw", api_uri=server.api_uri, webdav=False)
+            await client.login()
+            sync = MailboxSync(client)
+            await sync.sync()
+            assert sync.message_ids("Sent") == [1, 2, 3, 4, 5]
+
+            server.rpc_get_folders = lambda params, state: ok(folders=[{"id": "INBOX", "name": "Posteingang"}])
+            report = await sync.sync()
+            assert sorted(report["removed"]) == [("Sent", i) for i in range(1, 6)]
+            assert sync.message_ids("Sent") == []
+            assert sync.message_ids("INBOX") == [1, 2, 3, 4, 5]
+            sync.close()
+            await client.close()
+
+    asyncio.run(main())
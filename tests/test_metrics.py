@@ -0,0 +1,22 @@
+import asyncio
+from fake_server import FakeLernSax
+from lernsax import Client
+from lernsax.util import Metrics
+
+
+def test_concurrent_requests_record_their_own_latency():
+    async def main():
+        async with FakeLernSax(latency=0.2) as server:
+            metrics = Metrics()
+            client = Client("me@example.org", "pw", api_uri=server.api_uri, webdav=False, metrics=metrics)
+            await client.login()
+            group = client.member_of[0]
+            first = asyncio.ensure_future(client.get_tasks(group))
+            await asyncio.sleep(0.1)
+            await asyncio.gather(first, client.get_tasks(group))
+            histogram = metrics.histograms["request_seconds"][(("method", "get_entries"),)]
+            assert histogram.count == 2
+            assert histogram.sum >= 0.4
+            await client.close()
+
+    asyncio.run(main())
@@ -0,0 +1,11 @@
+import pytest
+from lernsax.util import MailHeader, Model, QuickMessage
+
+
+def test_models_are_hashable_and_abstract():
+    with pytest.raises(TypeError):
+        Model()
+    data = {"id": "1", "text": "hi", "date": "1600000000", "flags": ["is_read"], "from": {"login": "a"}, "to": {}}
+    first, second = QuickMessage.from_dict(data), QuickMessage.from_dict(data)
+    assert first == second and len({first, second}) == 1
+    assert first.flags == MailHeader.from_dict({"flags": ["is_read"]}).flags == ("is_read",)
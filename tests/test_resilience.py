@@ -0,0 +1,23 @@
+import asyncio
+import pytest
+from lernsax.util import CircuitBreaker, RetryPolicy
+from lernsax.util.exceptions import CircuitOpen
+
+
+def test_cancelled_trial_releases_breaker():
+    async def main():
+        breaker = CircuitBreaker(threshold=1, reset_timeout=0)
+        breaker.failure()
+        assert breaker.state == "half_open"
+        policy = RetryPolicy()
+        trial = asyncio.ensure_future(policy.run(lambda: asyncio.sleep(10), True, breaker))
+        await asyncio.sleep(0)
+        with pytest.raises(CircuitOpen):
+            breaker.before()
+        trial.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await trial
+        assert await policy.run(lambda: asyncio.sleep(0, "ok"), True, breaker) == "ok"
+        assert breaker.state == "closed"
+
+    asyncio.run(main())
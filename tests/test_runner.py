@@ -0,0 +1,33 @@
+import asyncio
+import pytest
+from fake_server import FakeLernSax
+from lernsax import ShardedRunner
+from lernsax.util import SqliteSessionStore
+
+
+def test_unpicklable_pool_options_raise():
+    with pytest.raises(ValueError):
+        ShardedRunner(2, session_store=SqliteSessionStore(":memory:"))
+
+
+def test_calls_of_a_dead_worker_fail_while_others_answer():
+    async def main():
+        async with FakeLernSax(latency=0.02) as server:
+            async with ShardedRunner(2, api_uri=server.api_uri, webdav=False) as runner:
+                emails = [f"user{i}@example.org" for i in range(20)]
+                dead = next(email for email in emails if runner.worker_of(email) == 0)
+                alive = next(email for email in emails if runner.worker_of(email) == 1)
+                runner.add(dead, "pw")
+                runner.add(alive, "pw")
+                runner.processes[0].terminate()
+                runner.processes[0].join()
+                pending = runner.submit(dead, "get_tasks", "group0@example.org")
+                for _ in range(200):
+                    await runner.submit(alive, "get_tasks", "group0@example.org")
+                    if pending.done():
+                        break
+                assert pending.done()
+                with pytest.raises(RuntimeError):
+                    await pending
+
+    asyncio.run(main())
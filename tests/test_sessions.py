@@ -0,0 +1,13 @@
+import os
+import stat
+from lernsax.util import FileSessionStore, SqliteSessionStore
+
+
+def test_session_stores_are_private(tmp_path):
+    sqlite_store = SqliteSessionStore(str(tmp_path / "sessions.db"))
+    sqlite_store.set("me@example.org", "sid", ["group0@example.org"])
+    file_store = FileSessionStore(str(tmp_path / "sessions.json"))
+    file_store.set("me@example.org", "sid", ["group0@example.org"])
+    for name in ("sessions.db", "sessions.json"):
+        assert stat.S_IMODE(os.stat(tmp_path / name).st_mode) == 0o600
+    assert sqlite_store.get("me@example.org") == ("sid", ["group0@example.org"])
@@ -0,0 +1,11 @@
+import copy
+import pickle
+from lernsax.util.view import AttrView, wrap
+
+
+def test_views_can_be_copied_and_pickled():
+    view = AttrView({"result": {"return": "OK", "entries": [{"id": "1"}]}})
+    for clone in (copy.copy(view), copy.deepcopy(view), pickle.loads(pickle.dumps(view))):
+        assert clone.result.entries[0].id == "1"
+    entries = wrap([{"id": "1"}])
+    assert pickle.loads(pickle.dumps(entries))[0].id == "1"